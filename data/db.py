@@ -1,8 +1,351 @@
 import sqlite3
 import os
+import re
+import time
+import threading
+from contextlib import contextmanager
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "stocks.db")
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+# =====================================================
+# CONNECTION MANAGER
+# =====================================================
+# get_connection()            -> this thread's reader (reused, never
+#                                really closed by callers)
+# get_connection(write=True)  -> THE writer connection; held exclusively
+#                                until .close() (or the end of a `with`
+#                                block, which also commits / rolls back)
+#
+# Callers keep the plain sqlite3 pattern (cursor / commit / close) and
+# pandas sees a real sqlite3.Connection. Every connection runs in WAL
+# mode with the pragmas below; per-connection statement caches make
+# repeated queries skip re-preparing.
+
+MMAP_BYTES = int(os.environ.get("DB_MMAP_MB", "256")) * 1024 * 1024
+CACHE_KB = int(os.environ.get("DB_CACHE_MB", "64")) * 1024
+STATEMENT_CACHE = 256
+BUSY_TIMEOUT = 30.0
+
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA mmap_size={MMAP_BYTES}",
+    f"PRAGMA cache_size=-{CACHE_KB}",
+]
+
+_LOCAL = threading.local()
+_WRITE_LOCK = threading.RLock()
+_WRITER = None
+_GENERATION = 0  # bumped by close_all(): pooled connections reopen
+_SHADOW_PATH = None  # set while shadow_update() routes writes to a copy
+_PID = os.getpid()
+
+# normalized sql -> [calls, total seconds, max seconds]
+_QUERY_STATS: dict[str, list] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _record(sql: str, started: float, calls: int = 1):
+    elapsed = time.perf_counter() - started
+    key = re.sub(r"\s+", " ", sql).strip()[:120]
+    with _STATS_LOCK:
+        entry = _QUERY_STATS.get(key)
+        if entry is None:
+            entry = _QUERY_STATS[key] = [0, 0.0, 0.0]
+        entry[0] += calls
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that records execute + fetch time per statement
+    """
+
+    _sql = ""
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record(sql, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record(sql, started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record(self._sql, started, calls=0)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            _record(self._sql, started, calls=0)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record(self._sql, started, calls=0)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    close() hands the connection back instead of closing it
+    (uncommitted changes are rolled back, like a real close).
+    """
+
+    writer = False
+    generation = 0
+    path = ""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        try:
+            if self.in_transaction:
+                self.rollback()
+        finally:
+            if self.writer:
+                _WRITE_LOCK.release()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return super().__exit__(exc_type, exc, tb)
+        finally:
+            self.close()
+
+    def _really_close(self):
+        sqlite3.Connection.close(self)
+
+
+def _open(writer: bool) -> PooledConnection:
+    path = (_SHADOW_PATH or DB_PATH) if writer else DB_PATH
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        factory=PooledConnection,
+        cached_statements=STATEMENT_CACHE,
+        check_same_thread=not writer,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma).fetchall()
+    conn.writer = writer
+    conn.generation = _GENERATION
+    conn.path = path
+    return conn
+
+
+def _check_fork():
+    # connections must not cross fork() (process pool workers)
+    global _PID, _WRITER, _LOCAL
+    if os.getpid() != _PID:
+        _PID = os.getpid()
+        _WRITER = None
+        _LOCAL = threading.local()
+
+
+def get_connection(write: bool = False):
+    global _WRITER
+
+    _check_fork()
+
+    if write:
+        _WRITE_LOCK.acquire()
+        try:
+            if (_WRITER is None or _WRITER.generation != _GENERATION
+                    or _WRITER.path != (_SHADOW_PATH or DB_PATH)):
+                if _WRITER is not None:
+                    _WRITER._really_close()
+                _WRITER = _open(writer=True)
+        except BaseException:
+            _WRITE_LOCK.release()
+            raise
+        return _WRITER
+
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None or conn.generation != _GENERATION:
+        if conn is not None:
+            conn._really_close()
+        conn = _LOCAL.conn = _open(writer=False)
+    return conn
+
+
+def close_all():
+    """
+    Close the writer now; every thread's reader reopens on its next
+    get_connection() (e.g. after the database file was replaced).
+    """
+    global _GENERATION
+
+    with _WRITE_LOCK:
+        _GENERATION += 1
+        _close_writer()
+
+
+def _close_writer():
+    global _WRITER
+    if _WRITER is not None:
+        _WRITER._really_close()
+        _WRITER = None
+
+
+# =====================================================
+# SHADOW UPDATES
+# =====================================================
+# with shadow_update():
+#     ... every get_connection(write=True) writes into stocks.db.shadow,
+#     a copy taken on entry; readers keep seeing the untouched live file
+#
+# On success the copy is published into the live file with ONE backup
+# step, i.e. one write transaction: WAL readers move from the complete
+# old state to the complete new state and never see a half-applied
+# update. The file itself is never renamed (open readers still hold its
+# -wal / -shm). On error the copy is dropped and live data is unchanged.
+
+SHADOW_UPDATES = os.environ.get("DB_SHADOW_UPDATE", "") in ("1", "true")
+
+_SHADOW_SUFFIXES = ("", "-wal", "-shm", "-journal")
+_SHADOW_STATS = {"published": 0, "discarded": 0, "copy_ms": None, "publish_ms": None}
+
+
+def _remove_shadow(path: str):
+    for suffix in _SHADOW_SUFFIXES:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _copy_database(src_path: str, dst_path: str):
+    """
+    Online copy through the backup API (pages=-1: a single step)
+    """
+    src = sqlite3.connect(src_path, timeout=BUSY_TIMEOUT)
+    dst = sqlite3.connect(dst_path, timeout=BUSY_TIMEOUT)
+    try:
+        src.backup(dst, pages=-1)
+    finally:
+        dst.close()
+        src.close()
+
+
+def shadow_active() -> bool:
+    return _SHADOW_PATH is not None
+
+
+@contextmanager
+def shadow_update(enabled: bool = True):
+    """
+    Route writes to a shadow copy, publish it atomically on success
+    """
+    global _SHADOW_PATH
+
+    if not enabled or _SHADOW_PATH is not None:
+        yield
+        return
+
+    path = DB_PATH + ".shadow"
+
+    with _WRITE_LOCK:
+        _remove_shadow(path)
+        started = time.perf_counter()
+        _copy_database(DB_PATH, path)
+        _SHADOW_STATS["copy_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _SHADOW_PATH = path  # the writer reopens on the copy
+
+    try:
+        yield
+    except BaseException:
+        with _WRITE_LOCK:
+            _close_writer()
+            _SHADOW_PATH = None
+            _remove_shadow(path)
+        _SHADOW_STATS["discarded"] += 1
+        raise
+
+    with _WRITE_LOCK:
+        _close_writer()
+        try:
+            started = time.perf_counter()
+            _copy_database(path, DB_PATH)
+            _SHADOW_STATS["publish_ms"] = round(
+                (time.perf_counter() - started) * 1000, 1
+            )
+            _SHADOW_STATS["published"] += 1
+        finally:
+            _SHADOW_PATH = None
+            _remove_shadow(path)
+
+
+# =====================================================
+# PRICES DATE LAYOUT
+# =====================================================
+# engine/migrate_prices.py rewrites `prices` as a WITHOUT ROWID table
+# with INTEGER day numbers (days since 1970-01-01) in `date`. Until a
+# database is migrated it still holds 'YYYY-MM-DD' text, so code that
+# binds a date parameter asks which layout is live.
+
+def prices_int_dates(conn=None) -> bool:
+    """
+    True when prices.date stores day numbers (migrated schema)
+    """
+    if conn is None:
+        conn = get_connection()
+    for _, name, decl, *_ in conn.execute("PRAGMA table_info(prices)").fetchall():
+        if name == "date":
+            return (decl or "").upper().startswith("INT")
+    return False
+
+
+def db_stats(top: int = 20) -> dict:
+    with _STATS_LOCK:
+        rows = [
+            {
+                "sql": sql,
+                "calls": calls,
+                "total_ms": round(total * 1000, 2),
+                "avg_ms": round(total * 1000 / calls, 3) if calls else None,
+                "max_ms": round(worst * 1000, 2),
+            }
+            for sql, (calls, total, worst) in _QUERY_STATS.items()
+        ]
+
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return {
+        "path": DB_PATH,
+        "pragmas": PRAGMAS,
+        "shadow": {
+            "enabled": SHADOW_UPDATES,
+            "active": shadow_active(),
+            **_SHADOW_STATS,
+        },
+        "queries": rows[:top],
+    }
+
+
+def reset_db_stats():
+    with _STATS_LOCK:
+        _QUERY_STATS.clear()
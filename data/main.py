@@ -28,6 +28,7 @@ import os
 import sys
 import json
 import logging
+from contextlib import asynccontextmanager
 from threading import Lock
 
 # =============================================================================
@@ -35,8 +36,9 @@ from threading import Lock
 # =============================================================================
 
 import yfinance as yf
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 # =============================================================================
 # PATH SETUP (BULLETPROOF)
@@ -52,12 +54,31 @@ if PROJECT_ROOT not in sys.path:
 # INTERNAL IMPORTS
 # =============================================================================
 
-from db import get_connection
+from db import get_connection, db_stats
 from engine.fetch_data import run_fetch_all
 
-from scan.engine import run_scan
+from scan.engine import (
+    run_scan,
+    run_history_scan,
+    iter_scan,
+    run_ranked_scan,
+    scan_values,
+    value_columns,
+)
+from scan.scoring import build_score
+from scan.utils import indicator_warmup
+from scan.cache import (
+    make_result_key,
+    get_cached_result,
+    set_cached_result,
+    cache_stats,
+)
+from scan.panel import get_panel, load_panel, refresh_panel
+from scan.parallel import DEFAULT_WORKERS
+from scan.snapshot import refresh_snapshot
+from scan.warmup import start_warmup, warmup_status
 from scan.builder import build_rule
-from scan.utils import required_bars
+from scan.jobs import QueueFull, submit_scan, get_job, cancel_job
 from scan.validator import validate_rule
 
 # 🔥 CHART ROUTER (SEPARATE FILE)
@@ -89,7 +110,16 @@ logger.info(f"Loaded {len(UNIVERSES)} universes from config")
 # FASTAPI APP
 # =============================================================================
 
-app = FastAPI(title="Stock Scanner Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # price panel: ONE bulk read before the first request
+    # (raises -> startup fails instead of serving empty scans)
+    load_panel()
+    warm_caches("startup")
+    yield
+
+
+app = FastAPI(title="Stock Scanner Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -117,16 +147,13 @@ update_lock = Lock()
 # =============================================================================
 
 def ensure_system_meta():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS system_meta (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with get_connection(write=True) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS system_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
 
 def get_meta(key: str):
     conn = get_connection()
@@ -137,16 +164,13 @@ def get_meta(key: str):
     return row[0] if row else None
 
 def set_meta(key: str, value: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO system_meta (key, value)
-        VALUES (?, ?)
-        ON CONFLICT(key)
-        DO UPDATE SET value=excluded.value
-    """, (key, value))
-    conn.commit()
-    conn.close()
+    with get_connection(write=True) as conn:
+        conn.execute("""
+            INSERT INTO system_meta (key, value)
+            VALUES (?, ?)
+            ON CONFLICT(key)
+            DO UPDATE SET value=excluded.value
+        """, (key, value))
 
 ensure_system_meta()
 
@@ -177,15 +201,34 @@ def run_update_task():
     try:
         logger.info("🚀 Starting market data update")
         max_date = run_fetch_all()
+        refresh_panel()
+        refresh_snapshot()
         if max_date:
             set_meta("last_price_update", max_date)
             logger.info(f"✅ Data updated till {max_date}")
+        warm_caches("update")
     except Exception as e:
         logger.error(f"❌ Update failed: {e}")
     finally:
         update_state["running"] = False
         update_state["message"] = "Idle"
 
+# =============================================================================
+# CACHE WARM-UP (AFTER STARTUP / EACH UPDATE, BACKGROUND)
+# =============================================================================
+
+def warm_caches(reason: str):
+    symbols = []
+    seen = set()
+    for universe in UNIVERSES:
+        for symbol in get_symbols_by_universe(universe):
+            if symbol not in seen:
+                seen.add(symbol)
+                symbols.append(symbol)
+
+    start_warmup(symbols, reason)
+    logger.info(f"🔥 Cache warm-up started ({reason}, {len(symbols)} symbols)")
+
 # =============================================================================
 # ROOT / HEALTH
 # =============================================================================
@@ -211,7 +254,15 @@ def update_data(background_tasks: BackgroundTasks):
 
 @app.get("/update/status")
 def update_status():
-    return update_state
+    return {**update_state, "warmup": warmup_status()}
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache_stats()
+
+@app.get("/db/stats")
+def get_db_stats():
+    return db_stats()
 
 # =============================================================================
 # UNIVERSES API (CONFIG ONLY)
@@ -306,34 +357,349 @@ def get_symbols_by_universe(universe: str):
 # SCAN API
 # =============================================================================
 
+# largest top_k a ranked /scan may ask for
+TOP_K_MAX = 1000
+
+
+def int_param(payload: dict, name: str, default, low: int, high: int,
+              clamp: bool = False):
+    """
+    Optional integer payload field ("3" accepted) in [low, high].
+    Not an integer -> 400; out of range -> 400, or clamped into range.
+    """
+    raw = payload.get(name)
+    if raw is None:
+        return default
+
+    value = None
+    if isinstance(raw, int) and not isinstance(raw, bool):
+        value = raw
+    elif isinstance(raw, str) and raw.strip().lstrip("-").isdigit():
+        value = int(raw)
+
+    if value is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    if clamp:
+        return min(max(value, low), high)
+    if not low <= value <= high:
+        raise HTTPException(
+            status_code=400, detail=f"{name} must be between {low} and {high}"
+        )
+    return value
+
+
+SCAN_MODES = ("loop", "vector", "parallel")
+
+
+def mode_param(payload: dict) -> str:
+    """
+    Scan mode from the payload (default "loop"); unknown -> 400
+    """
+    mode = payload.get("mode", "loop")
+    if mode not in SCAN_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode must be one of: {', '.join(SCAN_MODES)}",
+        )
+    return mode
+
 @app.post("/scan")
 def scan_stocks(payload: dict):
     universe = payload.get("universe")
     rule_json = payload.get("rule")
     timeframe = payload.get("timeframe", "1D")
-    indicators = payload.get("indicators", {})
+    mode = mode_param(payload)
+    workers = int_param(
+        payload, "workers", None, 1, DEFAULT_WORKERS, clamp=True
+    )
 
     if not universe or not rule_json:
         return {"count": 0, "symbols": []}
 
     validate_rule(rule_json)
 
-    symbols = get_symbols_by_universe(universe)
     rule_fn = build_rule(rule_json)
 
-    min_bars = max(required_bars(indicators), 50)
+    # Indicators come from the rule tree, not the client payload:
+    # exactly the columns the rules read, and a stable cache key.
+    indicators = rule_fn.indicators
+    min_bars = max(rule_fn.required_bars, 50)
+
+    # Same request + same data version -> same answer (mode / workers
+    # only change how it is computed).
+    data_version = get_panel()["version"]
+
+    # ---------- RANKED (TOP-K BY SCORE) ----------
+    score_json = payload.get("score")
+    if score_json:
+        # ranking keeps a heap inside the per-symbol loop
+        if mode != "loop":
+            raise HTTPException(
+                status_code=400, detail="ranked scans (score) only run in loop mode"
+            )
+        try:
+            score_fn = build_score(score_json)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        top_k = int_param(payload, "top_k", 50, 1, TOP_K_MAX)
+        order = payload.get("order", "desc")
+        if order not in ("desc", "asc"):
+            raise HTTPException(status_code=400, detail="order must be desc or asc")
+
+        min_bars = max(
+            min_bars,
+            indicator_warmup(score_fn.indicators) + score_fn.bars - 1,
+        )
+        result_key = make_result_key(
+            universe,
+            {"rule": rule_json, "score": score_json, "top_k": top_k, "order": order},
+            timeframe,
+            indicators,
+        )
+
+        ranked = get_cached_result(result_key, data_version)
+        if ranked is None:
+            ranked = run_ranked_scan(
+                symbols=get_symbols_by_universe(universe),
+                timeframe=timeframe,
+                indicator_config=indicators,
+                rule_fn=rule_fn,
+                score_fn=score_fn,
+                top_k=top_k,
+                min_bars=min_bars,
+                order=order,
+            )
+            set_cached_result(result_key, data_version, ranked)
+
+        response = {
+            "universe": universe,
+            "timeframe": timeframe,
+            "count": len(ranked),
+            "symbols": [r["symbol"] for r in ranked],
+            "ranked": ranked,
+        }
+
+        if payload.get("values"):
+            response["values"] = scan_values(
+                response["symbols"], timeframe, indicators,
+                value_columns(rule_fn, indicators),
+            )
+        return response
+
+    result_key = make_result_key(universe, rule_json, timeframe, indicators)
+
+    want_values = bool(payload.get("values"))
+    values = None
+
+    results = get_cached_result(result_key, data_version)
+    if results is None:
+        results = run_scan(
+            symbols=get_symbols_by_universe(universe),
+            timeframe=timeframe,
+            indicator_config=indicators,
+            rule_fn=rule_fn,
+            min_bars=min_bars,
+            mode=mode,
+            workers=workers,
+            values=want_values,
+        )
+        if want_values:
+            results, values = results
+        set_cached_result(result_key, data_version, results)
+
+    elif want_values:
+        # cached symbol list -> values from snapshot / cached columns
+        values = scan_values(
+            results, timeframe, indicators, value_columns(rule_fn, indicators)
+        )
 
-    results = run_scan(
-        symbols=symbols,
+    response = {
+        "universe": universe,
+        "timeframe": timeframe,
+        "count": len(results),
+        "symbols": results,
+    }
+
+    if want_values:
+        response["values"] = values
+
+    if payload.get("explain"):
+        response["plan"] = rule_fn.explain()
+
+    return response
+
+
+# progress frame every N symbols on /scan/stream
+STREAM_PROGRESS_EVERY = 50
+
+
+@app.post("/scan/stream")
+def scan_stream(payload: dict):
+    """
+    Same request as /scan, answered as NDJSON (one JSON object per line)
+    while the scan runs:
+
+        {"type": "match", "symbol": "TCS"}
+        {"type": "progress", "scanned": 150, "total": 2000}
+        {"type": "done", "count": 42, "scanned": 2000, "total": 2000}
+    """
+    universe = payload.get("universe")
+    rule_json = payload.get("rule")
+    timeframe = payload.get("timeframe", "1D")
+    # streamed scans always run the loop; a bad mode is still a 400
+    mode_param(payload)
+
+    if rule_json:
+        validate_rule(rule_json)
+
+    def frame(obj: dict) -> str:
+        return json.dumps(obj) + "\n"
+
+    def stream():
+        if not universe or not rule_json:
+            yield frame({"type": "done", "count": 0, "scanned": 0, "total": 0})
+            return
+
+        rule_fn = build_rule(rule_json)
+        indicators = rule_fn.indicators
+
+        data_version = get_panel()["version"]
+        result_key = make_result_key(universe, rule_json, timeframe, indicators)
+
+        symbols = get_symbols_by_universe(universe)
+        total = len(symbols)
+
+        cached = get_cached_result(result_key, data_version)
+        if cached is not None:
+            for symbol in cached:
+                yield frame({"type": "match", "symbol": symbol})
+            # same totals as the run that produced the cached list
+            yield frame({
+                "type": "done",
+                "count": len(cached),
+                "scanned": total,
+                "total": total,
+            })
+            return
+
+        matched = set()
+        scanned = 0
+
+        yield frame({"type": "progress", "scanned": 0, "total": total})
+
+        for symbol, ok in iter_scan(
+            symbols=symbols,
+            timeframe=timeframe,
+            indicator_config=indicators,
+            rule_fn=rule_fn,
+            min_bars=max(rule_fn.required_bars, 50),
+        ):
+            scanned += 1
+            if ok:
+                matched.add(symbol)
+                yield frame({"type": "match", "symbol": symbol})
+            if scanned % STREAM_PROGRESS_EVERY == 0:
+                yield frame({"type": "progress", "scanned": scanned, "total": total})
+
+        # complete run -> same list (universe order) as /scan would cache
+        results = [s for s in symbols if s in matched]
+        set_cached_result(result_key, data_version, results)
+
+        yield frame({
+            "type": "done",
+            "count": len(results),
+            "scanned": scanned,
+            "total": total,
+        })
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# =============================================================================
+# SCAN JOBS (ASYNC: SUBMIT / POLL / CANCEL)
+# =============================================================================
+
+@app.post("/scan/jobs")
+def create_scan_job(payload: dict):
+    """
+    Same payload as /scan. Returns a job id immediately; the scan runs
+    on the bounded job pool (scan/jobs.py).
+    """
+    universe = payload.get("universe")
+    rule_json = payload.get("rule")
+    timeframe = payload.get("timeframe", "1D")
+    # jobs run the loop on the job pool; a bad mode is still a 400
+    mode_param(payload)
+
+    if not universe or not rule_json:
+        raise HTTPException(status_code=400, detail="universe and rule are required")
+
+    validate_rule(rule_json)
+    rule_fn = build_rule(rule_json)
+
+    data_version = get_panel()["version"]
+    result_key = make_result_key(universe, rule_json, timeframe, rule_fn.indicators)
+
+    try:
+        job = submit_scan(
+            symbols=get_symbols_by_universe(universe),
+            timeframe=timeframe,
+            rule_fn=rule_fn,
+            min_bars=max(rule_fn.required_bars, 50),
+            on_complete=lambda results: set_cached_result(
+                result_key, data_version, results
+            ),
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return {"id": job["id"], "status": job["status"]}
+
+
+@app.get("/scan/jobs/{job_id}")
+def scan_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.delete("/scan/jobs/{job_id}")
+def cancel_scan_job(job_id: str):
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.post("/scan/history")
+def scan_history(payload: dict):
+    """
+    Dates on which the rule was true, per symbol.
+    Optional "start" (YYYY-MM-DD) limits the returned dates.
+    """
+    universe = payload.get("universe")
+    rule_json = payload.get("rule")
+    timeframe = payload.get("timeframe", "1D")
+
+    if not universe or not rule_json:
+        return {"count": 0, "signals": {}}
+
+    validate_rule(rule_json)
+    rule_fn = build_rule(rule_json)
+
+    signals = run_history_scan(
+        symbols=get_symbols_by_universe(universe),
         timeframe=timeframe,
-        indicator_config=indicators,
+        indicator_config=rule_fn.indicators,
         rule_fn=rule_fn,
-        min_bars=min_bars,
+        min_bars=max(rule_fn.required_bars, 50),
+        start=payload.get("start"),
     )
 
     return {
         "universe": universe,
         "timeframe": timeframe,
-        "count": len(results),
-        "symbols": results,
+        "count": len(signals),
+        "signals": signals,
     }
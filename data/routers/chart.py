@@ -11,6 +11,14 @@ Provides OHLC + volume chart data for frontend.
 URLS
 ----
 GET /chart?symbol=RELIANCE&tf=1D
+GET /chart/stats
+
+CACHING
+-------
+Every response carries an ETag built from symbol, tf, limit and the
+symbol's stock_meta.last_date. A matching If-None-Match is answered
+with 304, and serialized bodies are kept in a small LRU, so a repeat
+view costs one stock_meta lookup.
 ===============================================================================
 """
 
@@ -18,10 +26,18 @@ GET /chart?symbol=RELIANCE&tf=1D
 # IMPORTS
 # =============================================================================
 
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 
 from db import get_connection
+from scan.panel import get_prices, last_day
 
 # =============================================================================
 # ROUTER INITIALIZATION
@@ -29,12 +45,68 @@ from db import get_connection
 
 router = APIRouter(prefix="", tags=["Chart"])
 
+# =============================================================================
+# RESPONSE CACHE (ETAG -> SERIALIZED BODY, LRU)
+# =============================================================================
+
+CHART_CACHE_MAX = int(os.environ.get("CHART_CACHE_SIZE", 256))
+ETAG_FORMAT = "1"  # bump when the response shape changes
+
+_BODIES: "OrderedDict[str, bytes]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"not_modified": 0, "hits": 0, "misses": 0}
+
+
+def _last_date(symbol: str):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT last_date FROM stock_meta WHERE symbol = ?", (symbol,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def _etag(symbol: str, tf: str, limit: int, last_date: str) -> str:
+    raw = f"{ETAG_FORMAT}|{symbol}|{tf}|{limit}|{last_date}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def _remember(etag: str, body: bytes):
+    with _LOCK:
+        _BODIES[etag] = body
+        _BODIES.move_to_end(etag)
+        while len(_BODIES) > CHART_CACHE_MAX:
+            _BODIES.popitem(last=False)
+
+
+def _lookup(etag: str) -> bytes | None:
+    with _LOCK:
+        body = _BODIES.get(etag)
+        if body is not None:
+            _BODIES.move_to_end(etag)
+        return body
+
+
+def _json_response(body: bytes, etag: str | None) -> Response:
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # =============================================================================
 # CHART API
 # =============================================================================
 
 @router.get("/chart")
 def get_chart(
+    request: Request,
     symbol: str,
     tf: str = Query("1D", enum=["1D", "1W", "1M"]),
     limit: int = 1500,  # 🔥 safety limit
@@ -49,21 +121,44 @@ def get_chart(
     limit  : max candles returned (performance)
     """
 
-    conn = get_connection()
+    last_date = _last_date(symbol)
+    etag = _etag(symbol, tf, limit, last_date) if last_date else None
 
-    df = pd.read_sql_query(
-        """
-        SELECT date, open, high, low, close, volume
-        FROM prices
-        WHERE symbol = ?
-        ORDER BY date DESC
-        LIMIT ?
-        """,
-        conn,
-        params=(symbol, limit),
-    )
+    if etag:
+        if _matches(request.headers.get("if-none-match"), etag):
+            _STATS["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
 
-    conn.close()
+        body = _lookup(etag)
+        if body is not None:
+            _STATS["hits"] += 1
+            return _json_response(body, etag)
+
+    _STATS["misses"] += 1
+    payload = build_chart(symbol, tf, limit)
+    body = json.dumps(payload, separators=(",", ":")).encode()
+
+    # only cache what the panel serves for that exact last_date (the
+    # panel refreshes just after stock_meta moves during an update)
+    day = last_day(symbol)
+    if etag and day is not None and str(np.datetime64(day, "D")) == last_date:
+        _remember(etag, body)
+        return _json_response(body, etag)
+
+    return _json_response(body, None)
+
+
+@router.get("/chart/stats")
+def get_chart_stats():
+    return {"entries": len(_BODIES), "max_entries": CHART_CACHE_MAX, **_STATS}
+
+
+def build_chart(symbol: str, tf: str, limit: int) -> dict:
+    """
+    Aggregated OHLCV payload for one symbol / timeframe
+    """
+
+    df = get_prices(symbol, limit=limit)
 
     if df.empty:
         return {
@@ -73,12 +168,6 @@ def get_chart(
             "data": {},
         }
 
-    # Reverse back to ascending order
-    df = df.iloc[::-1]
-
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index("date", inplace=True)
-
     # ================= TIMEFRAME AGGREGATION =================
 
     if tf == "1D":
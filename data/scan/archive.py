@@ -0,0 +1,435 @@
+# scan/archive.py
+
+"""
+Optional memory-mapped columnar archive of the prices table.
+
+    SCAN_ARCHIVE=1        -> enabled, files under data/archive/
+    SCAN_ARCHIVE=/path    -> enabled, files under /path
+
+Layout:
+
+    <root>/manifest.json               {"generation", "symbols": {symbol: [rows, last_day]}}
+    <root>/<symbol>/date.i4            int32 day numbers (days since 1970-01-01)
+    <root>/<symbol>/open.f8 ... .f8    float64 open / high / low / close
+    <root>/<symbol>/volume.i8          int64
+
+Raw little-endian columns, one file per column per symbol, so a fetch
+appends bytes to the end of each file. SQLite stays the source of
+truth: export_archive() rebuilds everything from `prices`,
+append_archive() adds the rows stored since the last run, and
+check_archive() compares both.
+
+append_archive() only picks up rows with date > the symbol's last
+archived day. A past candle rewritten in SQLite (a corrected close, a
+split adjustment, a backfilled gap) is never copied over, and a shallow
+check_archive() -- row counts and last days only -- cannot see it; run
+check_archive(deep=True) to find it and export_archive() to repair it.
+
+The manifest decides how many rows are valid. It is replaced
+atomically after the column files are written, so a crashed append
+only leaves a tail that is never read and is truncated on the next
+append. Readers map the files with np.memmap (read-only, zero-copy).
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from db import get_connection, prices_int_dates
+from scan.panel import PRICE_COLUMNS, decode_dates
+
+# =====================================================
+# CONFIG
+# =====================================================
+_SETTING = os.environ.get("SCAN_ARCHIVE", "")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARCHIVE_DIR = (
+    os.path.join(BASE_DIR, "archive") if _SETTING in ("1", "true")
+    else _SETTING
+)
+ARCHIVE_ENABLED = bool(ARCHIVE_DIR)
+
+COLUMNS = ("date",) + PRICE_COLUMNS
+DTYPES = {
+    "date": np.dtype("<i4"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<i8"),
+}
+SUFFIX = {"date": "i4", "volume": "i8"}
+
+_LOCK = threading.Lock()
+
+# manifest as last read: (mtime_ns, manifest)
+_MANIFEST: tuple | None = None
+
+# symbol -> (generation, rows, {column: memmap})
+_MAPS: dict[str, tuple] = {}
+
+_STATS = {"reads": 0, "appended_rows": 0, "exports": 0, "errors": 0}
+
+
+def _column_path(root: str, symbol: str, col: str) -> str:
+    return os.path.join(root, symbol, f"{col}.{SUFFIX.get(col, 'f8')}")
+
+
+def _manifest_path(root: str | None = None) -> str:
+    return os.path.join(root or ARCHIVE_DIR, "manifest.json")
+
+
+# =====================================================
+# MANIFEST
+# =====================================================
+def read_manifest() -> dict | None:
+    """
+    Current manifest (re-read only when the file changed), or None
+    """
+    global _MANIFEST
+
+    path = _manifest_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    hit = _MANIFEST
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        _STATS["errors"] += 1
+        return None
+
+    _MANIFEST = (mtime, manifest)
+    return manifest
+
+
+def _write_manifest(root: str, symbols: dict):
+    manifest = {
+        "generation": time.time_ns(),
+        "symbols": {s: symbols[s] for s in sorted(symbols)},
+    }
+    path = _manifest_path(root)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# =====================================================
+# SQLITE SIDE
+# =====================================================
+def _fetch_rows(cur, symbol: str, after_day: int | None, int_dates: bool):
+    """
+    One symbol's rows (optionally only after a day) as column arrays
+    """
+    sql = (
+        "SELECT date, open, high, low, close, volume "
+        "FROM prices WHERE symbol = ?"
+    )
+    params = (symbol,)
+    if after_day is not None:
+        sql += " AND date > ?"
+        params += (
+            after_day if int_dates else str(np.datetime64(after_day, "D")),
+        )
+    cur.execute(sql + " ORDER BY date", params)
+    rows = cur.fetchall()
+
+    if not rows:
+        return None
+
+    date, o, h, l, c, v = zip(*rows)
+    return {
+        "date": decode_dates(np.array(date)),
+        "open": np.array(o, dtype=np.float64),
+        "high": np.array(h, dtype=np.float64),
+        "low": np.array(l, dtype=np.float64),
+        "close": np.array(c, dtype=np.float64),
+        "volume": np.array([x or 0 for x in v], dtype=np.int64),
+    }
+
+
+def _sqlite_summary(cur) -> dict:
+    """
+    symbol -> (rows, last_day) straight from prices
+    """
+    cur.execute("SELECT symbol, COUNT(*), MAX(date) FROM prices GROUP BY symbol")
+    out = {}
+    for symbol, rows, last in cur.fetchall():
+        if symbol is None or last is None:
+            continue
+        out[symbol] = (rows, int(decode_dates(np.array([last]))[0]))
+    return out
+
+
+# =====================================================
+# WRITE
+# =====================================================
+def _append_columns(root: str, symbol: str, valid_rows: int, cols: dict):
+    folder = os.path.join(root, symbol)
+    os.makedirs(folder, exist_ok=True)
+    for col in COLUMNS:
+        dtype = DTYPES[col]
+        with open(_column_path(root, symbol, col), "ab") as f:
+            f.truncate(valid_rows * dtype.itemsize)  # drop a torn tail
+            f.write(np.ascontiguousarray(cols[col], dtype=dtype).tobytes())
+
+
+def export_archive() -> int:
+    """
+    Full rebuild from SQLite into a fresh directory, swapped in at the
+    end (readers keep their old mappings). Returns rows written.
+    """
+    if not ARCHIVE_ENABLED:
+        return 0
+
+    with _LOCK:
+        root = os.path.abspath(ARCHIVE_DIR)
+        tmp_root = f"{root}.new"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        os.makedirs(tmp_root)
+
+        conn = get_connection()
+        cur = conn.cursor()
+        int_dates = prices_int_dates(conn)
+        cur.execute("SELECT DISTINCT symbol FROM prices WHERE symbol IS NOT NULL")
+        symbols = [r[0] for r in cur.fetchall()]
+
+        entries = {}
+        total = 0
+        for symbol in symbols:
+            cols = _fetch_rows(cur, symbol, None, int_dates)
+            if cols is None:
+                continue
+            _append_columns(tmp_root, symbol, 0, cols)
+            entries[symbol] = [len(cols["date"]), int(cols["date"][-1])]
+            total += len(cols["date"])
+        conn.close()
+
+        _write_manifest(tmp_root, entries)
+
+        old_root = f"{root}.old"
+        shutil.rmtree(old_root, ignore_errors=True)
+        if os.path.exists(root):
+            os.replace(root, old_root)
+        os.replace(tmp_root, root)
+        shutil.rmtree(old_root, ignore_errors=True)
+
+        _MAPS.clear()
+        _STATS["exports"] += 1
+        print(f"[ARCHIVE] exported {total} rows, {len(entries)} symbols")
+        return total
+
+
+def append_archive() -> int:
+    """
+    Append rows stored in SQLite since the last export / append.
+
+    stock_meta.last_date names the symbols that moved; each one is read
+    with a (symbol, date > last archived day) primary-key range scan.
+    Rewritten older candles are NOT picked up (see the module docstring).
+    Returns rows appended.
+    """
+    if not ARCHIVE_ENABLED:
+        return 0
+
+    if read_manifest() is None:
+        return export_archive()
+
+    with _LOCK:
+        root = os.path.abspath(ARCHIVE_DIR)
+        manifest = read_manifest()
+        entries = {s: list(e) for s, e in manifest["symbols"].items()}
+
+        conn = get_connection()
+        cur = conn.cursor()
+        int_dates = prices_int_dates(conn)
+        cur.execute("SELECT symbol, last_date FROM stock_meta")
+        meta = [(s, d) for s, d in cur.fetchall() if s and d]
+
+        added = 0
+        if meta:
+            meta_last = decode_dates([d for _, d in meta])
+            for (symbol, _), last in zip(meta, meta_last):
+                entry = entries.get(symbol)
+                if entry is not None and last <= entry[1]:
+                    continue
+
+                cols = _fetch_rows(
+                    cur, symbol, entry[1] if entry else None, int_dates
+                )
+                if cols is None:
+                    continue
+
+                rows = entry[0] if entry else 0
+                _append_columns(root, symbol, rows, cols)
+                entries[symbol] = [rows + len(cols["date"]), int(cols["date"][-1])]
+                added += len(cols["date"])
+        conn.close()
+
+        if added:
+            _write_manifest(root, entries)
+            _STATS["appended_rows"] += added
+            print(f"[ARCHIVE] appended {added} rows")
+        return added
+
+
+# =====================================================
+# READ
+# =====================================================
+def read_symbol(symbol: str):
+    """
+    (last_day, {column: read-only memmap}) for one symbol, or None.
+    Zero-copy: pages are read only when touched.
+    """
+    if not ARCHIVE_ENABLED:
+        return None
+
+    manifest = read_manifest()
+    if manifest is None:
+        return None
+    entry = manifest["symbols"].get(symbol)
+    if entry is None:
+        return None
+
+    generation = manifest["generation"]
+    hit = _MAPS.get(symbol)
+    if hit is not None and hit[0] == generation:
+        return hit[1], hit[2]
+
+    rows, last = entry
+    root = os.path.abspath(ARCHIVE_DIR)
+    try:
+        cols = {
+            col: np.memmap(
+                _column_path(root, symbol, col),
+                dtype=DTYPES[col], mode="r", shape=(rows,),
+            )
+            for col in COLUMNS
+        }
+    except (OSError, ValueError):
+        _STATS["errors"] += 1
+        return None
+
+    _MAPS[symbol] = (generation, last, cols)
+    _STATS["reads"] += 1
+    return last, cols
+
+
+def read_all():
+    """
+    (sorted symbols, per-symbol lengths, flat column arrays) for a
+    full panel build, or None when there is no archive
+    """
+    manifest = read_manifest() if ARCHIVE_ENABLED else None
+    if manifest is None:
+        return None
+
+    names, lengths, parts = [], [], {c: [] for c in COLUMNS}
+    for symbol in sorted(manifest["symbols"]):
+        hit = read_symbol(symbol)
+        if hit is None:
+            return None  # damaged: caller falls back to SQLite
+        cols = hit[1]
+        if not len(cols["date"]):
+            continue
+        names.append(symbol)
+        lengths.append(len(cols["date"]))
+        for c in COLUMNS:
+            parts[c].append(cols[c])
+
+    flat = {
+        c: (np.concatenate(parts[c]) if parts[c] else np.zeros(0, DTYPES[c]))
+        for c in COLUMNS
+    }
+    return names, np.array(lengths, dtype=np.int64), flat
+
+
+# =====================================================
+# CONSISTENCY CHECK
+# =====================================================
+def check_archive(deep: bool = False) -> dict:
+    """
+    Compare the archive with SQLite.
+
+    Shallow: per-symbol row count and last day, plus file sizes.
+    deep=True: every value of every column.
+    """
+    manifest = read_manifest() if ARCHIVE_ENABLED else None
+    if manifest is None:
+        return {"ok": False, "error": "no archive"}
+
+    conn = get_connection()
+    cur = conn.cursor()
+    int_dates = prices_int_dates(conn)
+    truth = _sqlite_summary(cur)
+    archived = manifest["symbols"]
+    root = os.path.abspath(ARCHIVE_DIR)
+
+    missing = sorted(set(truth) - set(archived))
+    extra = sorted(set(archived) - set(truth))
+    mismatched = []
+
+    for symbol in sorted(set(truth) & set(archived)):
+        rows, last = archived[symbol]
+        if (rows, last) != truth[symbol]:
+            mismatched.append({
+                "symbol": symbol,
+                "reason": "rows/last_day",
+                "archive": [rows, last],
+                "sqlite": list(truth[symbol]),
+            })
+            continue
+
+        short = [
+            col for col in COLUMNS
+            if os.path.getsize(_column_path(root, symbol, col))
+            < rows * DTYPES[col].itemsize
+        ]
+        if short:
+            mismatched.append({"symbol": symbol, "reason": f"short file: {short}"})
+            continue
+
+        if deep:
+            expect = _fetch_rows(cur, symbol, None, int_dates)
+            got = read_symbol(symbol)[1]
+            bad = [
+                col for col in COLUMNS
+                if not np.array_equal(expect[col], got[col])
+            ]
+            if bad:
+                mismatched.append({"symbol": symbol, "reason": f"values: {bad}"})
+    conn.close()
+
+    return {
+        "ok": not (missing or extra or mismatched),
+        "deep": deep,
+        "symbols": len(truth),
+        "missing": missing,
+        "extra": extra,
+        "mismatched": mismatched,
+    }
+
+
+def archive_stats() -> dict:
+    manifest = read_manifest() if ARCHIVE_ENABLED else None
+    symbols = manifest["symbols"] if manifest else {}
+    return {
+        "enabled": ARCHIVE_ENABLED,
+        "dir": ARCHIVE_DIR,
+        "symbols": len(symbols),
+        "rows": sum(e[0] for e in symbols.values()),
+        "mapped": len(_MAPS),
+        **_STATS,
+    }
@@ -6,26 +6,16 @@ from scan.rules import (
     crossing_up,
     rsi_above,
     rsi_below,
-    AND,
-    OR,
 )
+from scan.plan import Leaf, Group, RulePlan, leaf_key
 
 # =====================================================
 # COLUMN RESOLVERS (CRITICAL)
 # =====================================================
+# Defined next to the indicator code so computed columns and the rules
+# reading them can never drift apart.
 
-def sma_col(period: int) -> str:
-    return f"SMA_{period}"
-
-def ema_col(period: int) -> str:
-    return f"EMA_{period}"
-
-def rsi_col(period: int) -> str:
-    return f"RSI_{period}"
-
-def macd_cols(fast: int, slow: int, signal: int):
-    base = f"{fast}_{slow}_{signal}"
-    return f"MACD_{base}", f"MACD_SIGNAL_{base}"
+from scan.indicators import sma_col, rsi_col
 
 
 # =====================================================
@@ -64,37 +54,57 @@ RULE_MAP = {
 
 
 # =====================================================
-# BUILD RULE (RECURSIVE, SAFE)
+# INDICATOR COLUMNS EACH RULE READS
 # =====================================================
 
-def build_rule(rule_json):
-    """
-    Converts rule JSON into executable rule_fn(df)
+RULE_COLUMNS = {
+    "near_sma": lambda cfg: [sma_col(cfg["period"])],
+    "rising_sma": lambda cfg: [sma_col(cfg["period"])],
+    "crossing_sma": lambda cfg: [sma_col(cfg["period"])],
+    "rsi_above": lambda cfg: [rsi_col(cfg["period"])],
+    "rsi_below": lambda cfg: [rsi_col(cfg["period"])],
+}
 
-    Supported formats:
-    {
-      "AND": [rule, rule]
-    }
-    {
-      "OR": [rule, rule]
-    }
-    {
-      "near_sma": { "period": 50, "tolerance_pct": 1 }
-    }
-    """
 
+# =====================================================
+# INDICATORS EACH RULE NEEDS (indicator_config fragments)
+# =====================================================
+
+RULE_INDICATORS = {
+    "near_sma": lambda cfg: {"sma": [cfg["period"]]},
+    "rising_sma": lambda cfg: {"sma": [cfg["period"]]},
+    "crossing_sma": lambda cfg: {"sma": [cfg["period"]]},
+    "rsi_above": lambda cfg: {"rsi": [cfg["period"]]},
+    "rsi_below": lambda cfg: {"rsi": [cfg["period"]]},
+}
+
+
+# =====================================================
+# COMPILE (RECURSIVE, SAFE, SHARED SUB-TREES)
+# =====================================================
+
+def _compile(rule_json, nodes: dict):
     if not isinstance(rule_json, dict):
         raise ValueError("Rule must be a dictionary")
 
-    # ---------- AND ----------
-    if "AND" in rule_json:
-        rules = [build_rule(r) for r in rule_json["AND"]]
-        return AND(*rules)
-
-    # ---------- OR ----------
-    if "OR" in rule_json:
-        rules = [build_rule(r) for r in rule_json["OR"]]
-        return OR(*rules)
+    # ---------- AND / OR ----------
+    if "AND" in rule_json or "OR" in rule_json:
+        op = "AND" if "AND" in rule_json else "OR"
+
+        children = []
+        for r in rule_json[op]:
+            child = _compile(r, nodes)
+            if child not in children:
+                children.append(child)
+
+        # AND / OR are commutative -> order-free key
+        key = f"{op}({','.join(sorted(ch.key for ch in children))})"
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = Group(key, op, children)
+        else:
+            node.refs += 1
+        return node
 
     # ---------- LEAF ----------
     if len(rule_json) != 1:
@@ -105,4 +115,48 @@ def build_rule(rule_json):
     if rule_name not in RULE_MAP:
         raise ValueError(f"Unknown rule: {rule_name}")
 
-    return RULE_MAP[rule_name](cfg)
+    key = leaf_key(rule_name, cfg)
+    node = nodes.get(key)
+    if node is None:
+        node = nodes[key] = Leaf(
+            key,
+            rule_name,
+            cfg,
+            RULE_MAP[rule_name](cfg),
+            RULE_COLUMNS[rule_name](cfg),
+            RULE_INDICATORS[rule_name](cfg),
+        )
+    else:
+        node.refs += 1
+    return node
+
+
+# =====================================================
+# BUILD RULE
+# =====================================================
+
+def build_rule(rule_json) -> RulePlan:
+    """
+    Converts rule JSON into an executable, compiled plan.
+    The plan is used like any rule_fn(df) -> bool.
+
+    Supported formats:
+    {
+      "AND": [rule, rule]
+    }
+    {
+      "OR": [rule, rule]
+    }
+    {
+      "near_sma": { "period": 50, "tolerance_pct": 1 }
+    }
+
+    plan.indicators    -> minimal indicator_config the rule reads
+    plan.required_bars -> warm-up candles for those indicators
+    plan.explain()     -> the chosen (deduped, reordered) plan
+    """
+    nodes: dict = {}
+    root = _compile(rule_json, nodes)
+
+    # rule_json is kept so the plan can be rebuilt in worker processes
+    return RulePlan(root, rule_json, nodes)
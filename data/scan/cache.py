@@ -1,16 +1,48 @@
 # scan/cache.py
+import os
+import json
 import time
 import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
 import pandas as pd
 from typing import Optional
 
+from scan.panel import get_panel
+from scan.archive import archive_stats
+from scan.disk import load_columns, save_columns, disk_stats
+
 # =====================================================
-# IN-MEMORY CACHE
+# IN-MEMORY CACHE (LRU, BYTE BUDGET + TTL)
 # =====================================================
-_CACHE: dict[str, pd.DataFrame] = {}
-_CACHE_TS: dict[str, float] = {}
+# key -> (df, ts, nbytes); order = least recently used first
+_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+_LOCK = threading.Lock()
 
 DEFAULT_TTL = 60 * 30  # 30 minutes
+CACHE_MAX_BYTES = int(os.environ.get("SCAN_CACHE_MB", 512)) * 1024 * 1024
+
+# SCAN_CACHE_DEBUG=1 -> raise when a rule writes to a cached frame
+CACHE_DEBUG = os.environ.get("SCAN_CACHE_DEBUG") == "1"
+
+_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "expired": 0,
+    "evictions": 0,
+    "sets": 0,
+    "waits": 0,
+    "bytes": 0,
+}
+
+# scan results: key -> (data version, ts, symbols); LRU order, guarded
+# by _LOCK (request threads, the job pool and streams all use it)
+_RESULTS: "OrderedDict[str, tuple]" = OrderedDict()
+_RESULTS_VERSION = None
+
+RESULT_CACHE_MAX = 512
 
 
 # =====================================================
@@ -36,46 +68,364 @@ def _hash_config(config: dict) -> str:
     return hashlib.md5(raw.encode("utf-8")).hexdigest()
 
 
-def make_cache_key(symbol: str, tf: str, indicator_config: dict) -> str:
+def make_cache_key(symbol: str, tf: str, indicator_config: dict,
+                   window: int | None = None) -> str:
+    """
+    window: trailing candles held (tail mode), None = full history
+    """
     cfg_hash = _hash_config(indicator_config)
-    return f"{symbol}|{tf}|{cfg_hash}"
+    return f"{symbol}|{tf}|{cfg_hash}|{window or 'full'}|v{_data_version()}"
+
+
+# =====================================================
+# READ-ONLY FRAMES (ZERO-COPY HITS)
+# =====================================================
+class CachedFrameMutated(RuntimeError):
+    pass
+
+
+def frozen_frame(columns: dict[str, np.ndarray], index) -> pd.DataFrame:
+    """
+    DataFrame over `columns` (no copy), each array write-protected
+    first. In-place value writes (df.loc[...] = x) then raise instead
+    of corrupting the cache. Pass views you may freeze (e.g. slices).
+    """
+    for arr in columns.values():
+        arr.flags.writeable = False
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Read-only twin of an existing frame over the same buffers
+    """
+    # .view(): own flags, same memory (df itself stays writable)
+    return frozen_frame(
+        {col: df[col].to_numpy().view() for col in df.columns}, df.index
+    )
+
+
+def _fingerprint(df: pd.DataFrame) -> tuple:
+    return tuple(df.columns), df.shape, id(df.index)
+
+
+def call_readonly(rule_fn, df: pd.DataFrame) -> bool:
+    """
+    rule_fn(df) on a shared, cached frame. Rules only read; with
+    CACHE_DEBUG any write (values or structure) raises CachedFrameMutated.
+    """
+    if not CACHE_DEBUG:
+        return rule_fn(df)
+
+    before = _fingerprint(df)
+    try:
+        result = rule_fn(df)
+    except ValueError as e:
+        if "read-only" in str(e):
+            raise CachedFrameMutated(f"rule wrote to a cached frame: {e}") from e
+        raise
+
+    if _fingerprint(df) != before:
+        raise CachedFrameMutated("rule changed the structure of a cached frame")
+    return result
 
 
 # =====================================================
 # CACHE API
 # =====================================================
-def get_cached(symbol: str, tf: str, indicator_config: dict):
-    key = make_cache_key(symbol, tf, indicator_config)
+# Three levels share ONE LRU / byte budget:
+#   base   (symbol, tf)                     -> full candle frame
+#   column (symbol, tf, indicator, params)  -> arrays over the trailing
+#                                              candles computed (the
+#                                              longest window asked for)
+#   frame  (symbol, tf, config, window)     -> assembled scan frame
+# Frames are assembled from the lower levels (engine.build_frame), so
+# overlapping configs share candles and indicator work. Every key
+# carries the panel version: a data refresh makes old entries
+# unreachable and they age out of the LRU.
+
+def _data_version() -> int:
+    return get_panel()["version"]
+
 
-    if key not in _CACHE:
+def _drop(key: str):
+    entry = _CACHE.pop(key, None)
+    if entry is not None:
+        _STATS["bytes"] -= entry[2]
+
+
+def _get(key: str):
+    """
+    Lock-free hit path: a single dict read (atomic under the GIL) plus a
+    best-effort LRU touch. Counters are updated without the lock, so
+    they are approximate under heavy concurrency.
+    """
+    entry = _CACHE.get(key)
+    if entry is None:
+        _STATS["misses"] += 1
         return None
 
-    ts = _CACHE_TS.get(key, 0)
-    if time.time() - ts > DEFAULT_TTL:
-        print(f"[CACHE EXPIRED] {symbol} {tf}")
-        _CACHE.pop(key, None)
-        _CACHE_TS.pop(key, None)
+    if time.time() - entry[1] > DEFAULT_TTL:
+        with _LOCK:
+            if _CACHE.get(key) is entry:
+                _drop(key)
+                _STATS["expired"] += 1
+        _STATS["misses"] += 1
         return None
 
-    print(f"[CACHE HIT] {symbol} {tf}")
-    return _CACHE[key]
+    try:
+        _CACHE.move_to_end(key)
+    except KeyError:
+        pass  # evicted meanwhile; the value is still valid to use
+
+    _STATS["hits"] += 1
+    return entry[0]
+
+
+def _put(key: str, value, nbytes: int):
+    if nbytes > CACHE_MAX_BYTES:
+        return  # would evict everything else
+
+    with _LOCK:
+        _drop(key)
+        _CACHE[key] = (value, time.time(), nbytes)
+        _STATS["bytes"] += nbytes
+        _STATS["sets"] += 1
+
+        # ---------- CAPACITY EVICTION (LRU first) ----------
+        while _STATS["bytes"] > CACHE_MAX_BYTES:
+            old_key = next(iter(_CACHE))
+            _drop(old_key)
+            _STATS["evictions"] += 1
+
+
+# ---------- SINGLE-FLIGHT MISSES ----------
+# key -> {"done": Event, "value": ..., "error": ...}
+_INFLIGHT: dict[str, dict] = {}
+
+
+def _single_flight(key: str, compute, sizer):
+    """
+    Value for `key`, computing it at most once across threads: the first
+    caller runs compute(), concurrent callers for the same key wait for
+    that result. compute() returning None is passed on but not cached.
+    """
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None and time.time() - entry[1] <= DEFAULT_TTL:
+            return entry[0]  # filled while we were missing
+
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _INFLIGHT[key] = {
+                "done": threading.Event(),
+                "value": None,
+                "error": None,
+            }
+        else:
+            _STATS["waits"] += 1
+
+    if not leader:
+        flight["done"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["value"]
+
+    try:
+        value = compute()
+        if value is not None:
+            _put(key, value, sizer(value))
+        flight["value"] = value
+        return value
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with _LOCK:
+            _INFLIGHT.pop(key, None)
+        flight["done"].set()
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    # scan frames are all fixed-width numeric columns: itemsize x rows
+    # (memory_usage() builds a Series per column, too slow per symbol)
+    row = sum(dtype.itemsize for dtype in df.dtypes)
+    return int(df.index.nbytes + row * len(df))
+
+
+# ---------- FRAME LEVEL ----------
+def get_cached(symbol: str, tf: str, indicator_config: dict,
+               window: int | None = None):
+    return _get(make_cache_key(symbol, tf, indicator_config, window))
+
+
+def set_cache(symbol: str, tf: str, indicator_config: dict, df: pd.DataFrame,
+              window: int | None = None):
+    key = make_cache_key(symbol, tf, indicator_config, window)
+    df = freeze_frame(df)
+    _put(key, df, _frame_bytes(df))
+
+
+def build_cached(symbol: str, tf: str, indicator_config: dict,
+                 window: int | None, build):
+    """
+    Frame-level miss: build() -> read-only DataFrame (frozen_frame /
+    engine.build_frame) or None, once per key across concurrent scans
+    """
+    key = make_cache_key(symbol, tf, indicator_config, window)
+    return _single_flight(key, build, _frame_bytes)
+
+
+# ---------- BASE LEVEL ----------
+def cached_base(symbol: str, tf: str, load) -> pd.DataFrame:
+    """
+    Full candle frame for (symbol, tf); load() -> read-only frame
+    (panel.get_prices(readonly=True)), runs once per key
+    """
+    key = f"base|{symbol}|{tf}|v{_data_version()}"
+    base = _get(key)
+    if base is None:
+        base = _single_flight(key, load, _frame_bytes)
+    return base
+
+
+# ---------- COLUMN LEVEL ----------
+def _column_key(symbol: str, tf: str, indicator: str, params) -> str:
+    return f"col|{symbol}|{tf}|{indicator}|{json.dumps(params)}|v{_data_version()}"
+
+
+def get_columns(symbol: str, tf: str, indicator: str, params):
+    """
+    {column: array over the trailing candles it was computed on} for
+    ONE indicator, or None. Memory first, then the optional disk tier
+    (scan/disk.py, full history only).
+    """
+    key = _column_key(symbol, tf, indicator, params)
+    columns = _get(key)
+
+    if columns is None:
+        columns = load_columns(symbol, tf, indicator, params)
+        if columns is not None:
+            _put(key, columns, sum(arr.nbytes for arr in columns.values()))
+    return columns
+
+
+def set_columns(symbol: str, tf: str, indicator: str, params,
+                columns: dict[str, np.ndarray], full: bool = True):
+    """
+    full: computed over the whole history (only those go to disk)
+    """
+    for arr in columns.values():
+        arr.flags.writeable = False
+    nbytes = sum(arr.nbytes for arr in columns.values())
+    _put(_column_key(symbol, tf, indicator, params), columns, nbytes)
+    if full:
+        save_columns(symbol, tf, indicator, params, columns)
+
+
+# =====================================================
+# REQUESTED CONFIGS (WARM-UP INPUT)
+# =====================================================
+# (tf, canonical config JSON) -> scans that asked for it
+_REQUESTED: Counter = Counter()
+
+
+def note_config(tf: str, indicator_config: dict):
+    raw = json.dumps(indicator_config or {}, sort_keys=True)
+    _REQUESTED[(tf, raw)] += 1
+
+
+def popular_configs(n: int) -> list[tuple[str, dict]]:
+    """
+    The n most requested (timeframe, indicator_config) pairs
+    """
+    return [(tf, json.loads(raw)) for (tf, raw), _ in _REQUESTED.most_common(n)]
+
+
+# =====================================================
+# SCAN RESULT CACHE
+# =====================================================
+def make_result_key(universe: str, rule_json: dict, timeframe: str,
+                    indicator_config: dict | None = None) -> str:
+    """
+    Canonical hash of a scan request (key order never matters)
+    """
+    raw = json.dumps(
+        {
+            "universe": universe,
+            "rule": rule_json,
+            "timeframe": timeframe,
+            "indicators": indicator_config or {},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _check_version(version) -> bool:
+    """
+    True when `version` is the current one. A newer version makes every
+    stored result stale; an older one (a scan that started before a
+    refresh) must neither read nor evict newer results. Caller holds _LOCK.
+    """
+    global _RESULTS_VERSION
+    if _RESULTS_VERSION is None or version > _RESULTS_VERSION:
+        _RESULTS.clear()
+        _RESULTS_VERSION = version
+    return version == _RESULTS_VERSION
+
+
+def get_cached_result(key: str, version) -> list[str] | None:
+    """
+    version: price panel version at request time (bumped by every
+    refresh that loads new rows, even several on the same day)
+    """
+    with _LOCK:
+        if not _check_version(version):
+            return None
+
+        hit = _RESULTS.get(key)
+        if hit is None:
+            return None
+
+        if time.time() - hit[1] > DEFAULT_TTL:
+            del _RESULTS[key]
+            return None
+
+        _RESULTS.move_to_end(key)
+        return hit[2]
+
 
+def set_cached_result(key: str, version, symbols: list[str]):
+    with _LOCK:
+        if not _check_version(version):
+            return  # computed on data that has since been refreshed
 
-def set_cache(symbol: str, tf: str, indicator_config: dict, df: pd.DataFrame):
-    key = make_cache_key(symbol, tf, indicator_config)
-    _CACHE[key] = df
-    _CACHE_TS[key] = time.time()
-    print(f"[CACHE SET] {symbol} {tf}")
+        _RESULTS[key] = (version, time.time(), symbols)
+        _RESULTS.move_to_end(key)
 
+        while len(_RESULTS) > RESULT_CACHE_MAX:
+            _RESULTS.popitem(last=False)  # least recently used
 
 
 def clear_cache():
-    _CACHE.clear()
-    _CACHE_TS.clear()
+    with _LOCK:
+        _CACHE.clear()
+        _STATS["bytes"] = 0
+        _RESULTS.clear()
 
 
 def cache_stats():
+    lookups = _STATS["hits"] + _STATS["misses"]
     return {
         "entries": len(_CACHE),
-        "ttl_seconds": DEFAULT_TTL
+        **_STATS,
+        "hit_rate": round(_STATS["hits"] / lookups, 4) if lookups else 0.0,
+        "max_bytes": CACHE_MAX_BYTES,
+        "results": len(_RESULTS),
+        "ttl_seconds": DEFAULT_TTL,
+        "disk": disk_stats(),
+        "archive": archive_stats(),
     }
@@ -0,0 +1,135 @@
+# scan/disk.py
+
+"""
+Optional on-disk tier for indicator columns (survives restarts).
+
+    SCAN_DISK_CACHE=1        -> enabled, files under data/scan_cache/
+    SCAN_DISK_CACHE=/path    -> enabled, files under /path
+
+Layout: <root>/<tf>/<symbol>/<indicator>_<params>.v<FORMAT_VERSION>.<last_day>.<bars>.npy
+One 2D float64 array per indicator (rows = indicator_columns order).
+
+The format version, the symbol's last daily bar (stock_meta.last_date,
+as held by the price panel) and its candle count are part of the file
+name, so new data -- or files written by code with different indicator
+math / layout -- simply miss and are replaced on the next write.
+Files are opened lazily with mmap_mode="r": a warm restart maps them
+instead of recomputing, and pages are only read when a scan touches
+them.
+"""
+
+import os
+
+import numpy as np
+
+from scan.indicators import indicator_columns
+from scan.panel import get_tf_panel, last_day, symbol_slice
+
+# =====================================================
+# CONFIG
+# =====================================================
+_SETTING = os.environ.get("SCAN_DISK_CACHE", "")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DISK_CACHE_DIR = (
+    os.path.join(BASE_DIR, "scan_cache") if _SETTING in ("1", "true")
+    else _SETTING
+)
+DISK_CACHE_ENABLED = bool(DISK_CACHE_DIR)
+
+# bump whenever indicator math, column order or the file layout changes
+FORMAT_VERSION = 1
+
+_STATS = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+
+def _params_tag(params) -> str:
+    if isinstance(params, (list, tuple)):
+        return "-".join(str(p) for p in params)
+    return str(params)
+
+
+def _stem(symbol: str, tf: str, indicator: str, params):
+    """
+    (directory, file prefix, versioned file name) or None
+    """
+    day = last_day(symbol)
+    bounds = symbol_slice(symbol, get_tf_panel(tf))
+    if day is None or bounds is None:
+        return None
+
+    folder = os.path.join(DISK_CACHE_DIR, tf, symbol)
+    prefix = f"{indicator}_{_params_tag(params)}."
+    return folder, prefix, f"{prefix}v{FORMAT_VERSION}.{day}.{bounds[1] - bounds[0]}.npy"
+
+
+# =====================================================
+# READ / WRITE
+# =====================================================
+def load_columns(symbol: str, tf: str, indicator: str, params):
+    """
+    {column: read-only memmapped array} or None
+    """
+    if not DISK_CACHE_ENABLED:
+        return None
+
+    stem = _stem(symbol, tf, indicator, params)
+    if stem is None:
+        return None
+
+    path = os.path.join(stem[0], stem[2])
+    if not os.path.exists(path):
+        _STATS["misses"] += 1
+        return None
+
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except Exception:
+        _STATS["errors"] += 1
+        return None
+
+    _STATS["hits"] += 1
+    names = indicator_columns(indicator, params)
+    return {col: matrix[i] for i, col in enumerate(names)}
+
+
+def save_columns(symbol: str, tf: str, indicator: str, params,
+                 columns: dict[str, np.ndarray]):
+    if not DISK_CACHE_ENABLED:
+        return
+
+    stem = _stem(symbol, tf, indicator, params)
+    if stem is None:
+        return
+
+    folder, prefix, name = stem
+    names = indicator_columns(indicator, params)
+
+    try:
+        os.makedirs(folder, exist_ok=True)
+        matrix = np.vstack([np.asarray(columns[c], dtype=np.float64) for c in names])
+
+        # write + rename: readers never see a partial file
+        tmp = os.path.join(folder, f".{name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp, os.path.join(folder, name))
+
+        # older versions of the same indicator are dead
+        for old in os.listdir(folder):
+            if old.startswith(prefix) and old != name:
+                os.remove(os.path.join(folder, old))
+
+        _STATS["writes"] += 1
+    except Exception as e:
+        _STATS["errors"] += 1
+        print(f"[DISK CACHE ERROR] {symbol} {tf} {indicator}: {e}")
+
+
+def disk_stats() -> dict:
+    return {
+        "enabled": DISK_CACHE_ENABLED,
+        "dir": DISK_CACHE_DIR,
+        "format": FORMAT_VERSION,
+        **_STATS,
+    }
@@ -1,41 +1,48 @@
 # scan/engine.py
 
+import heapq
+
+import numpy as np
 import pandas as pd
-from db import get_connection
 
 from scan.indicators import (
+    indicator_columns,
     add_sma,
     add_ema,
     add_rsi,
     add_macd,
 )
 
-from scan.cache import get_cached, set_cache
+from scan.cache import (
+    CachedFrameMutated,
+    call_readonly,
+    get_cached,
+    build_cached,
+    cached_base,
+    frozen_frame,
+    get_columns,
+    set_columns,
+    note_config,
+)
+from scan.utils import merge_indicators, tail_bars
+from scan.scoring import is_rankable
+from scan.state import load_states, state_frame
+from scan.snapshot import scan_snapshot, snapshot_rows
+from scan.panel import get_prices
+from scan.vector import run_vector_scan
+from scan.parallel import (
+    DEFAULT_WORKERS,
+    PARALLEL_MIN_SYMBOLS,
+    run_parallel_scan,
+)
 
 
 # =====================================================
-# LOAD RAW PRICES FROM DB
+# LOAD RAW PRICES (COLUMNAR PANEL, NO PER-SYMBOL SQL)
 # =====================================================
-def load_prices(symbol: str) -> pd.DataFrame:
-    conn = get_connection()
-    df = pd.read_sql_query(
-        """
-        SELECT date, open, high, low, close, volume
-        FROM prices
-        WHERE symbol = ?
-        ORDER BY date
-        """,
-        conn,
-        params=(symbol,),
-    )
-    conn.close()
-
-    if df.empty:
-        return df
-
-    df["date"] = pd.to_datetime(df["date"])
-    df.set_index("date", inplace=True)
-    return df
+def load_prices(symbol: str, limit: int | None = None,
+                tf: str = "1D", readonly: bool = False) -> pd.DataFrame:
+    return get_prices(symbol, limit=limit, tf=tf, readonly=readonly)
 
 
 # =====================================================
@@ -108,56 +115,515 @@ def apply_indicators(df: pd.DataFrame, config: dict) -> pd.DataFrame:
     return df
 
 
+# =====================================================
+# FRAME ASSEMBLY (BASE CANDLES + INDICATOR COLUMNS)
+# =====================================================
+def _base_frame(symbol: str, timeframe: str) -> pd.DataFrame:
+    return cached_base(
+        symbol, timeframe, lambda: load_prices(symbol, tf=timeframe, readonly=True)
+    )
+
+
+def build_frame(symbol: str, timeframe: str, indicator_config: dict,
+                window: int | None = None) -> pd.DataFrame:
+    """
+    Trailing `window` candles (None = all) with the configured indicator
+    columns. Candles and each indicator are cached separately, so
+    configs that overlap share both.
+
+    The frame is read-only and zero-copy over the cached arrays.
+
+    Missing indicators are computed over the trailing `window` candles
+    only (tail mode). A cached column computed over at least as many
+    candles is reused by slicing its tail; a shorter one is recomputed
+    and replaced, so the column level keeps the longest window asked for.
+    """
+    base = _base_frame(symbol, timeframe)
+    if base.empty:
+        return base
+
+    need = min(window, len(base)) if window else len(base)
+    start = len(base) - need
+
+    entries = [(kind, p) for kind, params in indicator_config.items() for p in params]
+
+    columns = {}
+    missing: dict[str, list] = {}
+    for kind, p in entries:
+        hit = get_columns(symbol, timeframe, kind, p)
+        if hit is None or len(next(iter(hit.values()))) < need:
+            missing.setdefault(kind, []).append(p)
+        else:
+            columns.update(hit)
+
+    if missing:
+        # one pass for everything not cached yet, stored per indicator
+        out = apply_indicators(base[["close"]].iloc[start:], missing)
+        for kind, params in missing.items():
+            for p in params:
+                computed = {
+                    col: out[col].to_numpy(dtype=np.float64)
+                    for col in indicator_columns(kind, p)
+                }
+                set_columns(symbol, timeframe, kind, p, computed,
+                            full=need == len(base))
+                columns.update(computed)
+
+    data = {col: base[col].to_numpy()[start:] for col in base.columns}
+    for col, arr in columns.items():
+        data[col] = arr[len(arr) - need:]
+
+    # read-only: the frame may be shared through the frame cache
+    return frozen_frame(data, base.index[start:])
+
+
 # =====================================================
 # CORE SCAN ENGINE (CACHED + SAFE)
 # =====================================================
 def run_scan(
     symbols: list[str],
     timeframe: str,
-    indicator_config: dict,
+    indicator_config: dict | None,
     rule_fn,
     min_bars: int = 50,
-) -> list[str]:
+    mode: str = "loop",
+    workers: int | None = None,
+    tail: bool = True,
+    snapshot: bool = True,
+    values: bool = False,
+    on_match=None,
+):
     """
     rule_fn: callable(df) -> bool
+    indicator_config: None -> exactly what the rule reads
+                      (rule_fn.indicators, set by build_rule)
+
+    mode:
+        "loop"     -> one DataFrame + rule call per symbol (cached)
+        "vector"   -> rule_fn.vector over a symbols x bars matrix
+        "parallel" -> the loop, chunked across a process pool
+                      (needs a rule from build_rule; small universes
+                      and workers <= 1 fall back to "loop")
+
+    tail:
+        True  -> load / compute only the trailing candles the indicators
+                 and rules read (utils.tail_bars; EMA within EPS)
+        False -> full history
+        Rules without .bars always get full history.
+
+    snapshot:
+        True -> answer from latest_snapshot when the rule only reads
+                columns / bars it holds (scan/snapshot.py); symbols it
+                cannot answer run through `mode` as usual
+
+    values:
+        True -> return (symbols, payload): the columnar scan_values()
+                payload for the matches (last close, % change, volume
+                and every indicator column the rule reads)
+
+    on_match: optional callback(symbol, df) for every match that is
+              evaluated (not answered by the snapshot). df is anything
+              indexable by column name: the scan frame in the loop, the
+              trailing matrix values in vector mode, the last two values
+              of the worker's frame in parallel mode.
     """
 
     if not callable(rule_fn):
         raise TypeError("rule_fn must be a callable that accepts df")
 
-    results: list[str] = []
+    if indicator_config is None:
+        indicator_config = getattr(rule_fn, "indicators", {})
+
+    if values:
+        columns = value_columns(rule_fn, indicator_config)
+        held: dict[str, dict] = {}
+
+        def hold(symbol: str, df: pd.DataFrame):
+            held[symbol] = _last_values(df, columns)
+            if on_match is not None:
+                on_match(symbol, df)
+
+        matches = run_scan(
+            symbols=symbols,
+            timeframe=timeframe,
+            indicator_config=indicator_config,
+            rule_fn=rule_fn,
+            min_bars=min_bars,
+            mode=mode,
+            workers=workers,
+            tail=tail,
+            snapshot=snapshot,
+            on_match=hold,
+        )
+        return matches, scan_values(
+            matches, timeframe, indicator_config, columns, held
+        )
+
+    rule_bars = getattr(rule_fn, "bars", None)
+    tail = tail and rule_bars is not None
+
+    # ---------- MATERIALIZED SNAPSHOT ----------
+    if snapshot:
+        hit = scan_snapshot(symbols, timeframe, rule_fn, indicator_config, min_bars)
+        if hit is not None:
+            matches, pending = hit
+            if not pending:
+                return matches
+
+            matches = set(matches) | set(run_scan(
+                symbols=pending,
+                timeframe=timeframe,
+                indicator_config=indicator_config,
+                rule_fn=rule_fn,
+                min_bars=min_bars,
+                mode=mode,
+                workers=workers,
+                tail=tail,
+                snapshot=False,
+                on_match=on_match,
+            ))
+            return [s for s in symbols if s in matches]
+
+    if mode == "vector":
+        return run_vector_scan(
+            symbols=symbols,
+            timeframe=timeframe,
+            indicator_config=indicator_config,
+            rule_fn=rule_fn,
+            min_bars=min_bars,
+            tail=tail,
+            on_match=on_match,
+        )
+
+    if mode == "parallel":
+        rule_json = getattr(rule_fn, "rule_json", None)
+        n_workers = workers or DEFAULT_WORKERS
+
+        if (
+            rule_json is not None
+            and n_workers > 1
+            and len(symbols) >= PARALLEL_MIN_SYMBOLS
+        ):
+            return run_parallel_scan(
+                symbols=symbols,
+                timeframe=timeframe,
+                indicator_config=indicator_config,
+                rule_json=rule_json,
+                min_bars=min_bars,
+                workers=n_workers,
+                tail=tail,
+                on_match=on_match,
+            )
+
+        mode = "loop"
+
+    if mode != "loop":
+        raise ValueError(f"Unsupported scan mode: {mode}")
+
+    return [
+        symbol
+        for symbol, matched in _scan_symbols(
+            symbols, timeframe, indicator_config, rule_fn, min_bars, tail,
+            on_match=on_match,
+        )
+        if matched
+    ]
+
+
+# =====================================================
+# RESULT VALUES (COLUMNAR PAYLOAD FOR THE RESULTS TABLE)
+# =====================================================
+VALUE_FIELDS = ["close", "change_pct", "volume"]
+
+
+def value_columns(rule_fn, indicator_config: dict) -> list[str]:
+    """
+    Indicator columns to report: the ones the rule reads (build_rule
+    plans know them), else every column of the config.
+    """
+    columns = getattr(rule_fn, "columns", None)
+    if columns is None:
+        columns = [
+            col
+            for kind, params in indicator_config.items()
+            for p in params
+            for col in indicator_columns(kind, p)
+        ]
+    return [c for c in dict.fromkeys(columns) if c not in VALUE_FIELDS]
+
+
+def _last_values(df, columns: list[str]) -> dict:
+    """
+    Last-candle values from anything indexable by column name (a frame,
+    or {column: [prev, last]} from the snapshot).
+    """
+    close = np.asarray(df["close"], dtype=np.float64)
+    prev = close[-2] if len(close) > 1 else np.nan
+
+    row = {
+        "close": close[-1],
+        "change_pct": (close[-1] / prev - 1) * 100 if prev else np.nan,
+        "volume": np.asarray(df["volume"], dtype=np.float64)[-1],
+    }
+    for col in columns:
+        row[col] = np.asarray(df[col], dtype=np.float64)[-1] if col in df else np.nan
+    return row
+
+
+def _json_value(value):
+    value = float(value)
+    return round(value, 4) if value == value else None
+
+
+def scan_values(symbols: list[str], timeframe: str, indicator_config: dict,
+                columns: list[str], held: dict | None = None) -> dict:
+    """
+    {"symbol": [...], "close": [...], "change_pct": [...], "volume": [...],
+     <column>: [...]} -- one list per field, aligned with `symbols`.
+
+    Values come from what the engine already holds: rows seen during
+    the scan (`held`, any mode), then latest_snapshot. Only symbols
+    neither covers (e.g. values asked for a list that was not just
+    scanned) fall back to a 2-candle frame. NaN -> None.
+    """
+    held = dict(held or {})
+
+    rest = [s for s in symbols if s not in held]
+    if rest:
+        for symbol, snap in snapshot_rows(
+            rest, timeframe, ["close", "volume"] + columns
+        ).items():
+            held[symbol] = _last_values(snap, columns)
+
+    fields = VALUE_FIELDS + columns
+    out = {"symbol": list(symbols), **{f: [] for f in fields}}
 
     for symbol in symbols:
+        row = held.get(symbol)
+        if row is None:
+            try:
+                df = build_frame(symbol, timeframe, indicator_config, window=2)
+                row = _last_values(df, columns) if not df.empty else {}
+            except Exception as e:
+                print(f"[VALUES ERROR] {symbol}: {e}")
+                row = {}
+
+        for f in fields:
+            out[f].append(_json_value(row.get(f, np.nan)))
+
+    return out
+
+
+def _scan_symbols(symbols, timeframe, indicator_config, rule_fn,
+                  min_bars, tail, bars=None, on_match=None):
+    """
+    The per-symbol loop. Yields (symbol, matched) for EVERY symbol, in
+    order, as soon as it is evaluated.
+
+    bars:     trailing candles to keep (default rule_fn.bars)
+    on_match: optional callback(symbol, df) for each match, while the
+              symbol's frame is at hand
+    """
+    rule_bars = bars or getattr(rule_fn, "bars", None)
+    note_config(timeframe, indicator_config)
+
+    # ---------- WINDOW ----------
+    window = None
+    if tail:
+        window = max(tail_bars(indicator_config, rule_bars), min_bars)
+
+    # ---------- PERSISTED INDICATOR STATE ----------
+    states = load_states(timeframe, indicator_config, rule_bars) if tail else {}
+
+    for symbol in symbols:
+        matched = False
         try:
             # ---------- CACHE ----------
-            cached = get_cached(symbol, timeframe, indicator_config)
+            cached = get_cached(symbol, timeframe, indicator_config, window)
+
+            df = None
 
             if cached is not None:
-                df = cached.copy()  # 🔒 IMPORTANT
-            else:
-                # ---------- LOAD ----------
-                df = load_prices(symbol)
-                if df.empty:
-                    continue
+                df = cached  # read-only, shared (no copy)
+            elif symbol in states:
+                # stored values, no history recompute (None if out of sync)
+                df = state_frame(symbol, timeframe, states[symbol], min_bars)
+
+            if df is None:
+                # ---------- ASSEMBLE (shared candles + indicator columns) ----------
+                # concurrent scans needing the same frame build it once
+                def build():
+                    frame = build_frame(symbol, timeframe, indicator_config, window)
+                    if frame.empty or len(frame) < min_bars:
+                        return None
+                    return frame
+
+                df = build_cached(symbol, timeframe, indicator_config, window, build)
+
+            # ---------- RULE ----------
+            if df is not None:
+                matched = bool(call_readonly(rule_fn, df))
+                if matched and on_match is not None:
+                    on_match(symbol, df)
 
-                df = get_tf_candles(df, timeframe)
-                if len(df) < min_bars:
-                    continue
+        except CachedFrameMutated:
+            raise
+        except Exception as e:
+            print(f"[SCAN ERROR] {symbol}: {e}")
+
+        yield symbol, matched
+
+
+# =====================================================
+# STREAMING SCAN
+# =====================================================
+def iter_scan(
+    symbols: list[str],
+    timeframe: str,
+    indicator_config: dict | None,
+    rule_fn,
+    min_bars: int = 50,
+    tail: bool = True,
+    snapshot: bool = True,
+):
+    """
+    Generator form of run_scan (loop mode): yields (symbol, matched)
+    for every symbol as soon as it is decided. Snapshot-answered
+    symbols come first, the rest follow in universe order.
+    """
+    if not callable(rule_fn):
+        raise TypeError("rule_fn must be a callable that accepts df")
 
-                df = apply_indicators(df, indicator_config)
-                if len(df) < min_bars:
-                    continue
+    if indicator_config is None:
+        indicator_config = getattr(rule_fn, "indicators", {})
 
-                # print(symbol, df.columns.tolist()[-5:])
+    tail = tail and getattr(rule_fn, "bars", None) is not None
 
-                set_cache(symbol, timeframe, indicator_config, df)
+    pending = symbols
+    if snapshot:
+        hit = scan_snapshot(symbols, timeframe, rule_fn, indicator_config, min_bars)
+        if hit is not None:
+            matches, pending = hit
+            matched = set(matches)
+            waiting = set(pending)
+            for symbol in symbols:
+                if symbol not in waiting:
+                    yield symbol, symbol in matched
 
+    yield from _scan_symbols(
+        pending, timeframe, indicator_config, rule_fn, min_bars, tail
+    )
 
-            # ---------- RULE ----------
-            if rule_fn(df):
-                results.append(symbol)
+
+# =====================================================
+# RANKED SCAN (TOP-K, BOUNDED HEAP)
+# =====================================================
+def run_ranked_scan(
+    symbols: list[str],
+    timeframe: str,
+    indicator_config: dict | None,
+    rule_fn,
+    score_fn,
+    top_k: int = 50,
+    min_bars: int = 50,
+    order: str = "desc",
+    tail: bool = True,
+) -> list[dict]:
+    """
+    The top_k matches by score_fn (scan/scoring.py), best first:
+        [{"symbol": "TCS", "score": 3.2}, ...]
+
+    Only a heap of top_k entries is kept while scanning; matches whose
+    score is NaN are not ranked. order: "desc" (highest first) / "asc".
+    """
+    if order not in ("desc", "asc"):
+        raise ValueError(f"Unsupported order: {order}")
+
+    if indicator_config is None:
+        indicator_config = getattr(rule_fn, "indicators", {})
+    indicator_config = merge_indicators(indicator_config, score_fn.indicators)
+
+    rule_bars = getattr(rule_fn, "bars", None)
+    tail = tail and rule_bars is not None
+    bars = max(rule_bars or 1, score_fn.bars)
+
+    sign = 1.0 if order == "desc" else -1.0
+    top_k = max(int(top_k), 1)
+    heap: list[tuple] = []  # min-heap of (signed score, -seq, symbol)
+    seq = 0
+
+    def rank(symbol: str, df: pd.DataFrame):
+        nonlocal seq
+        value = score_fn(df)
+        if not is_rankable(value):
+            return
+
+        seq += 1
+        item = (sign * value, -seq, symbol)  # ties -> earlier symbol wins
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    for _ in _scan_symbols(
+        symbols, timeframe, indicator_config, rule_fn, min_bars, tail,
+        bars=bars, on_match=rank,
+    ):
+        pass
+
+    return [
+        {"symbol": symbol, "score": round(signed * sign, 4)}
+        for signed, _, symbol in sorted(heap, reverse=True)
+    ]
+
+
+# =====================================================
+# HISTORICAL SIGNALS (EVERY BAR, ONE PASS PER SYMBOL)
+# =====================================================
+def run_history_scan(
+    symbols: list[str],
+    timeframe: str,
+    indicator_config: dict | None,
+    rule_fn,
+    min_bars: int = 50,
+    start: str | None = None,
+) -> dict[str, list[str]]:
+    """
+    {symbol: [dates the rule was true]} over full history.
+
+    rule_fn needs .series(df) (every rule in scan/rules.py and every
+    build_rule plan has it). A bar only counts once `min_bars` candles
+    exist, like run_scan. start: optional YYYY-MM-DD lower bound.
+    """
+    series = getattr(rule_fn, "series", None)
+    if series is None:
+        raise TypeError("rule_fn has no whole-series form (rule.series)")
+
+    if indicator_config is None:
+        indicator_config = getattr(rule_fn, "indicators", {})
+
+    since = pd.Timestamp(start) if start else None
+    results: dict[str, list[str]] = {}
+
+    for symbol in symbols:
+        try:
+            df = load_prices(symbol, tf=timeframe)
+            if len(df) < min_bars:
+                continue
+
+            df = apply_indicators(df, indicator_config)
+
+            signal = series(df).to_numpy(dtype=bool)
+            signal = signal & (np.arange(len(df)) >= min_bars - 1)
+
+            dates = df.index[signal]
+            if since is not None:
+                dates = dates[dates >= since]
+
+            if len(dates):
+                results[symbol] = dates.strftime("%Y-%m-%d").tolist()
 
         except Exception as e:
-            print(f"[SCAN ERROR] {symbol}: {e}")
+            print(f"[HISTORY ERROR] {symbol}: {e}")
 
     return results
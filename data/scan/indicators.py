@@ -1,10 +1,47 @@
 import pandas as pd
 
+# =====================================================
+# COLUMN NAMES (SINGLE SOURCE OF TRUTH)
+# =====================================================
+# Rules (scan/builder.py) resolve columns with these same helpers,
+# so a computed indicator and the rule reading it always agree.
+
+def sma_col(period: int) -> str:
+    return f"SMA_{period}"
+
+def ema_col(period: int) -> str:
+    return f"EMA_{period}"
+
+def rsi_col(period: int) -> str:
+    return f"RSI_{period}"
+
+def macd_cols(fast: int, slow: int, signal: int):
+    base = f"{fast}_{slow}_{signal}"
+    return f"MACD_{base}", f"MACD_SIGNAL_{base}"
+
+def macd_hist_col(fast: int, slow: int, signal: int) -> str:
+    return f"MACD_HIST_{fast}_{slow}_{signal}"
+
+def indicator_columns(kind: str, params) -> list[str]:
+    """
+    Every column one indicator entry adds (e.g. "macd", [12, 26, 9])
+    """
+    if kind == "sma":
+        return [sma_col(params)]
+    if kind == "ema":
+        return [ema_col(params)]
+    if kind == "rsi":
+        return [rsi_col(params)]
+    if kind == "macd":
+        return [*macd_cols(*params), macd_hist_col(*params)]
+    raise ValueError(f"Unsupported indicator: {kind}")
+
+
 # =====================================================
 # SIMPLE MOVING AVERAGE
 # =====================================================
 def add_sma(df, period):
-    col = f"SMA_{period}"
+    col = sma_col(period)
     df[col] = df["close"].rolling(period).mean()
     return df
 
@@ -13,7 +50,7 @@ def add_sma(df, period):
 # EXPONENTIAL MOVING AVERAGE
 # =====================================================
 def add_ema(df: pd.DataFrame, length: int) -> pd.DataFrame:
-    col = f"ema_{length}"
+    col = ema_col(length)
 
     if col not in df.columns:
         df[col] = df["close"].ewm(span=length, adjust=False).mean()
@@ -25,7 +62,7 @@ def add_ema(df: pd.DataFrame, length: int) -> pd.DataFrame:
 # RELATIVE STRENGTH INDEX (RSI)
 # =====================================================
 def add_rsi(df: pd.DataFrame, length: int = 14) -> pd.DataFrame:
-    col = f"rsi_{length}"
+    col = rsi_col(length)
 
     if col in df.columns:
         return df
@@ -54,9 +91,8 @@ def add_macd(
     signal: int = 9
 ) -> pd.DataFrame:
 
-    macd_col = f"macd_{fast}_{slow}"
-    signal_col = f"macd_signal_{signal}"
-    hist_col = f"macd_hist"
+    macd_col, signal_col = macd_cols(fast, slow, signal)
+    hist_col = macd_hist_col(fast, slow, signal)
 
     if macd_col in df.columns:
         return df
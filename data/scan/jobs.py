@@ -0,0 +1,174 @@
+# scan/jobs.py
+
+"""
+Asynchronous scan jobs.
+
+    submit_scan(...)  -> job dict (id returned to the client at once)
+    get_job(id)       -> progress + partial matches
+    cancel_job(id)    -> cooperative: the scan loop stops at the next
+                         symbol (queued jobs never start)
+
+Jobs run on their OWN small thread pool (MAX_RUNNING), not on the
+FastAPI threadpool, so a burst of heavy scans cannot starve /chart or
+/stocks. At most MAX_QUEUED jobs may wait; beyond that submit_scan
+raises QueueFull. Finished jobs are kept for JOB_TTL seconds.
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scan.engine import iter_scan
+
+# =====================================================
+# CONFIG
+# =====================================================
+MAX_RUNNING = int(os.environ.get("SCAN_JOB_WORKERS", 2))
+MAX_QUEUED = int(os.environ.get("SCAN_JOB_QUEUE", 16))
+JOB_TTL = 60 * 10  # 10 minutes
+
+FINISHED = ("done", "cancelled", "failed")
+
+_JOBS: dict[str, dict] = {}
+_LOCK = threading.Lock()
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_RUNNING,
+                               thread_name_prefix="scan-job")
+
+
+class QueueFull(Exception):
+    pass
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def _purge():
+    now = time.time()
+    for job_id, job in list(_JOBS.items()):
+        if job["status"] in FINISHED and now - job["finished"] > JOB_TTL:
+            _JOBS.pop(job_id, None)
+
+
+def _finish(job: dict, status: str, error: str | None = None):
+    job["status"] = status
+    job["error"] = error
+    job["finished"] = time.time()
+
+
+def _run(job: dict, symbols: list[str], timeframe: str, rule_fn,
+         min_bars: int, on_complete):
+    if job["cancel"].is_set():
+        _finish(job, "cancelled")
+        return
+
+    job["status"] = "running"
+    job["started"] = time.time()
+
+    try:
+        for symbol, matched in iter_scan(
+            symbols=symbols,
+            timeframe=timeframe,
+            indicator_config=rule_fn.indicators,
+            rule_fn=rule_fn,
+            min_bars=min_bars,
+        ):
+            # ---------- COOPERATIVE CANCEL (between symbols) ----------
+            if job["cancel"].is_set():
+                _finish(job, "cancelled")
+                return
+
+            job["scanned"] += 1
+            if matched:
+                job["matches"].append(symbol)
+
+    except Exception as e:
+        print(f"[SCAN JOB ERROR] {job['id']}: {e}")
+        _finish(job, "failed", str(e))
+        return
+
+    # universe order, like run_scan
+    matched = set(job["matches"])
+    job["matches"] = [s for s in symbols if s in matched]
+
+    if on_complete is not None:
+        on_complete(job["matches"])
+
+    _finish(job, "done")
+
+
+# =====================================================
+# JOB API
+# =====================================================
+def submit_scan(symbols: list[str], timeframe: str, rule_fn,
+                min_bars: int = 50, on_complete=None) -> dict:
+    """
+    Queue a scan. on_complete(results) runs after a full, uncancelled
+    scan (e.g. to fill the result cache).
+    """
+    with _LOCK:
+        _purge()
+
+        queued = sum(j["status"] == "queued" for j in _JOBS.values())
+        if queued >= MAX_QUEUED:
+            raise QueueFull(f"{queued} scan jobs already queued")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "timeframe": timeframe,
+            "total": len(symbols),
+            "scanned": 0,
+            "matches": [],
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "cancel": threading.Event(),
+        }
+        _JOBS[job["id"]] = job
+
+    _EXECUTOR.submit(_run, job, symbols, timeframe, rule_fn, min_bars,
+                     on_complete)
+    return job
+
+
+def get_job(job_id: str) -> dict | None:
+    job = _JOBS.get(job_id)
+    if job is None:
+        return None
+
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "timeframe": job["timeframe"],
+        "scanned": job["scanned"],
+        "total": job["total"],
+        "count": len(job["matches"]),
+        "symbols": list(job["matches"]),
+        "error": job["error"],
+    }
+
+
+def cancel_job(job_id: str) -> dict | None:
+    job = _JOBS.get(job_id)
+    if job is None:
+        return None
+
+    if job["status"] not in FINISHED:
+        job["cancel"].set()
+        if job["status"] == "queued":
+            _finish(job, "cancelled")
+
+    return get_job(job_id)
+
+
+def job_stats() -> dict:
+    statuses = [j["status"] for j in list(_JOBS.values())]
+    return {
+        "queued": statuses.count("queued"),
+        "running": statuses.count("running"),
+        "max_running": MAX_RUNNING,
+        "max_queued": MAX_QUEUED,
+    }
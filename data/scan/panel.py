@@ -0,0 +1,551 @@
+# scan/panel.py
+
+"""
+Process-wide columnar price panel.
+
+All daily candles live in contiguous NumPy arrays, grouped by symbol:
+
+    symbols[i]                      -> symbol name
+    offset[i] : offset[i]+length[i] -> that symbol's rows
+    date                            -> int32 day numbers (days since 1970-01-01)
+    open / high / low / close       -> float64
+    volume                          -> int64
+
+The panel is built with ONE bulk read of the `prices` table and
+refreshed incrementally after each data update, so scans and charts
+never go back to SQLite per symbol.
+"""
+
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from db import get_connection, prices_int_dates
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+logger = logging.getLogger("uvicorn.error")
+
+# =====================================================
+# PANEL STATE
+# =====================================================
+_PANEL: dict | None = None
+_LOCK = threading.RLock()
+
+# resampled panels: tf -> panel (rebuilt when the daily panel version moves)
+_TF_PANELS: dict[str, dict] = {}
+
+
+def _empty_panel(version: int = 0) -> dict:
+    return {
+        "version": version,
+        "symbols": [],
+        "index": {},
+        "offset": np.zeros(0, dtype=np.int64),
+        "length": np.zeros(0, dtype=np.int64),
+        "date": np.zeros(0, dtype=np.int32),
+        "open": np.zeros(0, dtype=np.float64),
+        "high": np.zeros(0, dtype=np.float64),
+        "low": np.zeros(0, dtype=np.float64),
+        "close": np.zeros(0, dtype=np.float64),
+        "volume": np.zeros(0, dtype=np.int64),
+    }
+
+
+# =====================================================
+# DB READS
+# =====================================================
+def _read_rows(where: str = "", params: tuple = ()) -> pd.DataFrame:
+    conn = get_connection()
+    df = pd.read_sql_query(
+        f"""
+        SELECT symbol, date, open, high, low, close, volume
+        FROM prices
+        {where}
+        ORDER BY symbol, date
+        """,
+        conn,
+        params=params,
+    )
+    conn.close()
+    return df
+
+
+def decode_dates(values) -> np.ndarray:
+    """
+    prices.date -> int32 day numbers
+
+    Migrated tables already store day numbers (a plain cast); legacy
+    'YYYY-MM-DD' text is parsed in one vectorized pass.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int32)
+    parsed = pd.to_datetime(pd.Series(values), format="%Y-%m-%d")
+    return parsed.to_numpy().astype("datetime64[D]").astype(np.int32)
+
+
+def _rows_to_arrays(df: pd.DataFrame) -> dict:
+    """
+    Sorted (symbol, date) rows -> flat column arrays + symbol codes
+    """
+    symbols = df["symbol"].to_numpy()
+    return {
+        "symbol": symbols,
+        "date": decode_dates(df["date"]),
+        "open": df["open"].to_numpy(dtype=np.float64),
+        "high": df["high"].to_numpy(dtype=np.float64),
+        "low": df["low"].to_numpy(dtype=np.float64),
+        "close": df["close"].to_numpy(dtype=np.float64),
+        "volume": df["volume"].fillna(0).to_numpy(dtype=np.int64),
+    }
+
+
+def _build_panel(symbol_names: list[str], codes: np.ndarray, cols: dict,
+                 version: int) -> dict:
+    """
+    codes must already be sorted (grouped by symbol, dates ascending)
+    """
+    length = np.bincount(codes, minlength=len(symbol_names)).astype(np.int64)
+    offset = np.zeros(len(symbol_names), dtype=np.int64)
+    if len(symbol_names):
+        offset[1:] = np.cumsum(length)[:-1]
+
+    panel = {
+        "version": version,
+        "symbols": list(symbol_names),
+        "index": {s: i for i, s in enumerate(symbol_names)},
+        "offset": offset,
+        "length": length,
+    }
+    for c in ("date",) + PRICE_COLUMNS:
+        panel[c] = np.ascontiguousarray(cols[c])
+    return panel
+
+
+# =====================================================
+# LOAD / REFRESH
+# =====================================================
+def load_panel() -> dict:
+    """
+    Full rebuild from the prices table (startup).
+    Raises when prices cannot be read: an empty panel would silently
+    answer every scan with "no matches".
+    """
+    global _PANEL
+
+    with _LOCK:
+        version = (_PANEL["version"] + 1) if _PANEL else 1
+
+        if _load_from_archive(version):
+            # catch up with anything stored since the archive's last append
+            return refresh_panel()
+
+        try:
+            df = _read_rows()
+        except Exception:
+            logger.exception("[PANEL] load failed, cannot read prices")
+            raise
+
+        if df.empty:
+            _PANEL = _empty_panel(version)
+            return _PANEL
+
+        cols = _rows_to_arrays(df)
+        names, codes = np.unique(cols["symbol"], return_inverse=True)
+
+        # SQL collation and NumPy ordering agree for plain ASCII symbols;
+        # re-group defensively if they ever don't
+        if len(codes) > 1 and (codes[1:] < codes[:-1]).any():
+            order = np.argsort(codes, kind="stable")
+            codes = codes[order]
+            cols = {c: v[order] for c, v in cols.items()}
+
+        _PANEL = _build_panel(names.tolist(), codes, cols, version)
+        return _PANEL
+
+
+def _load_from_archive(version: int) -> bool:
+    """
+    Build the panel from the columnar archive (scan/archive.py) when it
+    is enabled: a read of flat files instead of a SQLite row scan
+    """
+    global _PANEL
+
+    from scan.archive import ARCHIVE_ENABLED, read_all
+
+    if not ARCHIVE_ENABLED:
+        return False
+    try:
+        data = read_all()
+    except Exception as e:
+        print(f"[PANEL] archive unreadable ({e}) → SQLite")
+        return False
+    if data is None:
+        return False
+
+    names, length, cols = data
+    codes = np.repeat(np.arange(len(names)), length)
+    _PANEL = _build_panel(names, codes, cols, version)
+    return True
+
+
+def refresh_panel() -> dict:
+    """
+    Incremental refresh after run_fetch_all.
+
+    Uses stock_meta.last_date to find symbols that moved past the
+    panel's last bar, reads ONLY their new rows and merges them in.
+    """
+    global _PANEL
+
+    with _LOCK:
+        if _PANEL is None:
+            return load_panel()
+
+        old = _PANEL
+
+        try:
+            conn = get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT symbol, last_date FROM stock_meta")
+            meta = [(s, d) for s, d in cur.fetchall() if s and d]
+            conn.close()
+        except Exception as e:
+            print(f"[PANEL] stock_meta unavailable ({e}) → full reload")
+            return load_panel()
+
+        if not meta:
+            return old
+
+        meta_last = decode_dates([d for _, d in meta])
+
+        stale = {}
+        new_symbols = []
+        for (symbol, _), last in zip(meta, meta_last):
+            i = old["index"].get(symbol)
+            if i is None or not old["length"][i]:
+                new_symbols.append(symbol)
+                continue
+            panel_last = int(old["date"][old["offset"][i] + old["length"][i] - 1])
+            if last > panel_last:
+                stale[symbol] = panel_last
+
+        if not new_symbols and not stale:
+            return old
+
+        frames = []
+
+        if stale:
+            cutoff = min(stale.values())
+            if not prices_int_dates():
+                cutoff = str(np.datetime64(cutoff, "D"))
+            df = _read_rows("WHERE date > ?", (cutoff,))
+            if not df.empty:
+                # NaN for symbols that are not stale -> comparison is False
+                cut = df["symbol"].map(stale).to_numpy(dtype=np.float64)
+                frames.append(df[decode_dates(df["date"]) > cut])
+
+        # New symbols: whole history (chunked to stay under SQLite's var limit)
+        for i in range(0, len(new_symbols), 500):
+            chunk = new_symbols[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            frames.append(_read_rows(f"WHERE symbol IN ({marks})", tuple(chunk)))
+
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return old
+
+        fresh = _rows_to_arrays(pd.concat(frames, ignore_index=True))
+
+        names = sorted(set(old["symbols"]) | set(fresh["symbol"].tolist()))
+        index = {s: i for i, s in enumerate(names)}
+        remap = np.array([index[s] for s in old["symbols"]], dtype=np.int64)
+
+        old_codes = np.repeat(remap, old["length"])
+        new_codes = np.array([index[s] for s in fresh["symbol"]], dtype=np.int64)
+
+        codes = np.concatenate([old_codes, new_codes])
+        # stable: old rows stay ahead of the (later-dated) new rows
+        order = np.argsort(codes, kind="stable")
+
+        cols = {
+            c: np.concatenate([old[c], fresh[c]])[order]
+            for c in ("date",) + PRICE_COLUMNS
+        }
+
+        _PANEL = _build_panel(names, codes[order], cols, old["version"] + 1)
+        print(f"[PANEL] refreshed: {len(fresh['date'])} new rows, "
+              f"{len(new_symbols)} new symbols")
+        return _PANEL
+
+
+def get_panel() -> dict:
+    """
+    Current panel (lazy-loaded on first use)
+    """
+    if _PANEL is None:
+        return load_panel()
+    return _PANEL
+
+
+# =====================================================
+# TIMEFRAME PANELS (VECTORIZED RESAMPLE, NSE SAFE)
+# =====================================================
+def period_ids(dates: np.ndarray, tf: str):
+    """
+    day numbers -> (period id, period label as day number)
+
+    1D : the day itself
+    1W : ISO week (Monday based), labelled with its Friday
+    1M : calendar month, labelled with its last day
+    """
+    dates = np.asarray(dates)
+
+    if tf == "1D":
+        return dates.astype(np.int64), dates.astype(np.int64)
+
+    if tf == "1W":
+        # day 4 (1970-01-05) is a Monday
+        week = (dates.astype(np.int64) - 4) // 7
+        return week, week * 7 + 8
+
+    if tf == "1M":
+        month = dates.astype("datetime64[D]").astype("datetime64[M]")
+        label = (month + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+        return month.astype(np.int64), label.astype(np.int64)
+
+    raise ValueError(f"Unsupported timeframe: {tf}")
+
+
+def _resample_panel(panel: dict, tf: str) -> dict:
+    n_rows = len(panel["date"])
+    if n_rows == 0:
+        out = _empty_panel(panel["version"])
+        out["symbols"] = list(panel["symbols"])
+        out["index"] = dict(panel["index"])
+        out["offset"] = np.zeros(len(panel["symbols"]), dtype=np.int64)
+        out["length"] = np.zeros(len(panel["symbols"]), dtype=np.int64)
+        return out
+
+    codes = np.repeat(np.arange(len(panel["symbols"])), panel["length"])
+    period, label = period_ids(panel["date"], tf)
+
+    boundary = np.ones(n_rows, dtype=bool)
+    boundary[1:] = (codes[1:] != codes[:-1]) | (period[1:] != period[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n_rows)
+
+    cols = {
+        "date": label[starts].astype(np.int32),
+        "open": panel["open"][starts],
+        "high": np.maximum.reduceat(panel["high"], starts),
+        "low": np.minimum.reduceat(panel["low"], starts),
+        "close": panel["close"][ends - 1],
+        "volume": np.add.reduceat(panel["volume"], starts),
+    }
+    return _build_panel(panel["symbols"], codes[starts], cols, panel["version"])
+
+
+def get_tf_panel(tf: str = "1D") -> dict:
+    """
+    Panel aggregated to a timeframe (1D / 1W / 1M).
+    Resampled once per panel version for ALL symbols at once.
+    """
+    panel = get_panel()
+    if tf == "1D":
+        return panel
+
+    cached = _TF_PANELS.get(tf)
+    if cached is not None and cached["version"] == panel["version"]:
+        return cached
+
+    out = _resample_panel(panel, tf)
+    _TF_PANELS[tf] = out
+    return out
+
+
+# =====================================================
+# SHARED MEMORY EXPORT (PROCESS-POOL WORKERS)
+# =====================================================
+_SHARED_ARRAYS = ("offset", "length", "date") + PRICE_COLUMNS
+
+# worker side: keeps the attached block alive for the process lifetime
+_ATTACHED = None
+
+
+def share_panel(panel: dict | None = None):
+    """
+    Copy the panel into ONE shared memory block.
+
+    Returns (SharedMemory, descriptor). The caller owns the block and
+    must close() + unlink() it; the descriptor is small and picklable.
+    """
+    from multiprocessing import shared_memory
+
+    if panel is None:
+        panel = get_panel()
+
+    layout = {}
+    pos = 0
+    for c in _SHARED_ARRAYS:
+        arr = panel[c]
+        layout[c] = (pos, arr.dtype.str, len(arr))
+        pos += -(-arr.nbytes // 64) * 64  # keep every array 64-byte aligned
+
+    shm = shared_memory.SharedMemory(create=True, size=max(pos, 1))
+    for c, (start, dtype, size) in layout.items():
+        view = np.ndarray(size, dtype=dtype, buffer=shm.buf, offset=start)
+        view[:] = panel[c]
+
+    desc = {
+        "name": shm.name,
+        "version": panel["version"],
+        "symbols": list(panel["symbols"]),
+        "layout": layout,
+    }
+    return shm, desc
+
+
+def attach_panel(desc: dict) -> dict:
+    """
+    Worker side: make the shared block this process's panel (read-only,
+    zero-copy). Never touches SQLite.
+    """
+    from multiprocessing import shared_memory
+
+    global _PANEL, _ATTACHED
+
+    shm = shared_memory.SharedMemory(name=desc["name"])
+
+    panel = {
+        "version": desc["version"],
+        "symbols": desc["symbols"],
+        "index": {s: i for i, s in enumerate(desc["symbols"])},
+    }
+    for c, (start, dtype, size) in desc["layout"].items():
+        view = np.ndarray(size, dtype=dtype, buffer=shm.buf, offset=start)
+        view.flags.writeable = False
+        panel[c] = view
+
+    _ATTACHED = shm
+    _PANEL = panel
+    _TF_PANELS.clear()
+    return panel
+
+
+# =====================================================
+# PER-SYMBOL ACCESS
+# =====================================================
+def symbol_slice(symbol: str, panel: dict | None = None):
+    """
+    (start, end) row range for a symbol, or None
+    """
+    if panel is None:
+        panel = get_panel()
+    i = panel["index"].get(symbol)
+    if i is None:
+        return None
+    start = int(panel["offset"][i])
+    return start, start + int(panel["length"][i])
+
+
+def last_day(symbol: str) -> int | None:
+    """
+    Day number of the symbol's last daily candle, or None
+    """
+    panel = get_panel()
+    bounds = symbol_slice(symbol, panel)
+    if bounds is None or bounds[0] == bounds[1]:
+        return None
+    return int(panel["date"][bounds[1] - 1])
+
+
+def get_prices(symbol: str, limit: int | None = None,
+               tf: str = "1D", readonly: bool = False) -> pd.DataFrame:
+    """
+    OHLCV frame for one symbol (date index, ascending).
+    Same shape the old per-symbol SQL loader produced.
+
+    limit    : only the trailing `limit` candles
+    tf       : 1D / 1W / 1M candles (from the resampled panel)
+    readonly : zero-copy, write-protected views of the panel (for
+               frames that are shared, e.g. the base cache level)
+    """
+    if tf == "1D":
+        df = _archive_prices(symbol, limit)
+        if df is not None:
+            return df
+
+    panel = get_tf_panel(tf)
+    bounds = symbol_slice(symbol, panel)
+
+    if bounds is None or bounds[0] == bounds[1]:
+        return pd.DataFrame(columns=list(PRICE_COLUMNS))
+
+    start, end = bounds
+    if limit:
+        start = max(start, end - limit)
+
+    index = pd.DatetimeIndex(
+        panel["date"][start:end].astype("datetime64[D]").astype("datetime64[ns]"),
+        name="date",
+    )
+    if not readonly:
+        return pd.DataFrame(
+            {c: panel[c][start:end] for c in PRICE_COLUMNS},
+            index=index,
+        )
+
+    columns = {}
+    for c in PRICE_COLUMNS:
+        view = panel[c][start:end]  # own flags; the panel is untouched
+        view.flags.writeable = False
+        columns[c] = view
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def _archive_prices(symbol: str, limit: int | None) -> pd.DataFrame | None:
+    """
+    Daily candles straight from the archive's memmaps (zero-copy
+    columns), unless the archive lags the loaded panel
+    """
+    from scan.archive import ARCHIVE_ENABLED, read_symbol
+
+    if not ARCHIVE_ENABLED:
+        return None
+    hit = read_symbol(symbol)
+    if hit is None:
+        return None
+
+    archived_last, cols = hit
+    if _PANEL is not None and last_day(symbol) != archived_last:
+        return None
+
+    start = max(0, len(cols["date"]) - limit) if limit else 0
+    index = pd.DatetimeIndex(
+        cols["date"][start:].astype("datetime64[D]").astype("datetime64[ns]"),
+        name="date",
+    )
+    return pd.DataFrame(
+        {c: cols[c][start:] for c in PRICE_COLUMNS},
+        index=index,
+        copy=False,
+    )
+
+
+def panel_stats() -> dict:
+    panel = _PANEL
+    if panel is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "version": panel["version"],
+        "symbols": len(panel["symbols"]),
+        "rows": int(len(panel["date"])),
+        "bytes": int(sum(
+            panel[c].nbytes for c in ("date", "offset", "length") + PRICE_COLUMNS
+        )),
+    }
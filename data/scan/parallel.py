@@ -0,0 +1,213 @@
+# scan/parallel.py
+
+"""
+Process-pool execution for run_scan.
+
+The symbol list is split into chunks that run the normal per-symbol
+loop inside worker processes. Workers attach to the price panel through
+ONE shared memory block (scan/panel.py: share_panel / attach_panel), so
+no DataFrames are pickled. Rules travel as their JSON and are rebuilt
+in the worker (closures cannot be pickled).
+
+The pool (DEFAULT_WORKERS processes, env SCAN_WORKERS) is created
+lazily and kept for the process lifetime; it is rebuilt only when the
+panel version changes. A smaller `workers` request only limits how many
+chunks run at once, it never resizes the pool.
+
+Pool + shared panel form one generation, reference-counted by the scans
+using it: a panel refresh starts a new generation for new scans, and
+the old one is shut down / unlinked when its last scan finishes.
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scan.panel import get_panel, share_panel, attach_panel
+
+# =====================================================
+# CONFIG
+# =====================================================
+DEFAULT_WORKERS = int(os.environ.get("SCAN_WORKERS", 0)) or (os.cpu_count() or 1)
+
+# below this many symbols pool overhead dominates -> run serially
+PARALLEL_MIN_SYMBOLS = 200
+
+# chunks per worker (smaller chunks = better balance, more IPC)
+CHUNKS_PER_WORKER = 4
+
+# =====================================================
+# POOL STATE
+# =====================================================
+class _Generation:
+    """
+    One pool + the shared panel its workers attached to
+    """
+
+    def __init__(self, key, pool: ProcessPoolExecutor, shm):
+        self.key = key
+        self.pool = pool
+        self.shm = shm
+        self.users = 0  # scans currently submitting / collecting
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.shm.close()
+        self.shm.unlink()
+
+
+_CURRENT: _Generation | None = None
+_LOCK = threading.Lock()
+
+
+def _init_worker(desc: dict):
+    attach_panel(desc)
+
+
+def _scan_chunk(args) -> tuple[list[str], dict]:
+    """
+    (matches, rows): with `collect`, rows holds the last two values of
+    every column of each matched frame (frames are never pickled back)
+    """
+    from scan.builder import build_rule
+    from scan.engine import run_scan
+
+    symbols, timeframe, indicator_config, rule_json, min_bars, tail, collect = args
+
+    rows: dict[str, dict] = {}
+
+    def keep(symbol, df):
+        rows[symbol] = {
+            col: np.asarray(df[col], dtype=np.float64)[-2:] for col in df.columns
+        }
+
+    matches = run_scan(
+        symbols=symbols,
+        timeframe=timeframe,
+        indicator_config=indicator_config,
+        rule_fn=build_rule(rule_json),
+        min_bars=min_bars,
+        tail=tail,
+        snapshot=False,
+        on_match=keep if collect else None,
+    )
+    return matches, rows
+
+
+def _acquire() -> _Generation:
+    """
+    Generation for the current panel version, held until _release(gen)
+    """
+    global _CURRENT
+
+    panel = get_panel()
+    key = panel["version"]
+    retired = None
+
+    with _LOCK:
+        if _CURRENT is None or _CURRENT.key != key:
+            shm, desc = share_panel(panel)
+            pool = ProcessPoolExecutor(
+                max_workers=DEFAULT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(desc,),
+            )
+            # in-flight scans keep the old one until they finish
+            if _CURRENT is not None and _CURRENT.users == 0:
+                retired = _CURRENT
+            _CURRENT = _Generation(key, pool, shm)
+
+        gen = _CURRENT
+        gen.users += 1
+
+    if retired is not None:
+        retired.close()
+    return gen
+
+
+def _release(gen: _Generation):
+    with _LOCK:
+        gen.users -= 1
+        idle = gen.users == 0 and gen is not _CURRENT
+
+    if idle:
+        gen.close()
+
+
+def shutdown_pool():
+    """
+    Retire the current generation (closed now if idle, else by its
+    last scan)
+    """
+    global _CURRENT
+
+    with _LOCK:
+        gen, _CURRENT = _CURRENT, None
+        idle = gen is not None and gen.users == 0
+
+    if idle:
+        gen.close()
+
+
+atexit.register(shutdown_pool)
+
+
+# =====================================================
+# PARALLEL SCAN
+# =====================================================
+def run_parallel_scan(
+    symbols: list[str],
+    timeframe: str,
+    indicator_config: dict,
+    rule_json: dict,
+    min_bars: int = 50,
+    workers: int | None = None,
+    tail: bool = True,
+    on_match=None,
+) -> list[str]:
+    """
+    Same result list (same order) as the serial loop
+
+    on_match: optional callback(symbol, row) for each match; row maps
+              every column of the worker's frame to its last two values
+    """
+    workers = min(max(int(workers or DEFAULT_WORKERS), 1), DEFAULT_WORKERS)
+
+    n_chunks = min(len(symbols), workers * CHUNKS_PER_WORKER) or 1
+    size = -(-len(symbols) // n_chunks)
+    chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+    gen = _acquire()
+    jobs = [
+        (chunk, timeframe, indicator_config, rule_json, min_bars, tail,
+         on_match is not None)
+        for chunk in chunks
+    ]
+
+    results: list[str] = []
+
+    def collect(future):
+        matches, rows = future.result()
+        results.extend(matches)
+        if on_match is not None:
+            for symbol in matches:
+                on_match(symbol, rows[symbol])
+
+    # at most `workers` chunks in flight; collected in submission order
+    # -> deterministic output
+    try:
+        pending = []
+        for job in jobs:
+            if len(pending) >= workers:
+                collect(pending.pop(0))
+            pending.append(gen.pool.submit(_scan_chunk, job))
+        for future in pending:
+            collect(future)
+    finally:
+        _release(gen)
+    return results
@@ -0,0 +1,259 @@
+# scan/plan.py
+
+"""
+Compiled rule plans (produced by scan/builder.py: build_rule).
+
+A plan is still a plain rule_fn(df) -> bool (and has .vector(m) /
+.bars for vector mode, .series(df) for historical signals), but
+underneath:
+
+- identical leaves / sub-trees are compiled into ONE shared node and
+  evaluated at most once per symbol (memo per evaluation)
+- every node records the indicator columns it needs and the minimal
+  indicator_config that produces them (plan.indicators)
+- AND / OR children are reordered by estimated cost and measured pass
+  rate so short-circuiting prunes the most work:
+      AND -> cheapest, most-likely-False first   (cost / (1 - p))
+      OR  -> cheapest, most-likely-True first    (cost / p)
+
+Pass rates are kept per node key for the process lifetime, so repeated
+scans keep learning.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from scan.rules import bar_matrix
+from scan.utils import indicator_warmup, merge_indicators
+
+# re-sort children after this many root evaluations
+REORDER_EVERY = 256
+
+# node key -> [evaluated, passed]
+_STATS: dict[str, list[int]] = {}
+
+
+def _stats(key: str) -> list[int]:
+    st = _STATS.get(key)
+    if st is None:
+        st = _STATS.setdefault(key, [0, 0])
+    return st
+
+
+def leaf_key(name: str, cfg) -> str:
+    return f"{name}{json.dumps(cfg, sort_keys=True, separators=(',', ':'))}"
+
+
+# =====================================================
+# NODES
+# =====================================================
+class Leaf:
+    def __init__(self, key: str, name: str, cfg, fn, columns: list[str],
+                 indicators: dict):
+        self.key = key
+        self.name = name
+        self.cfg = cfg
+        self.fn = fn
+        self.columns = list(columns)
+        self.indicators = merge_indicators(indicators)
+        self.bars = getattr(fn, "bars", 1)
+        self.refs = 1
+
+    @property
+    def cost(self) -> float:
+        # bars read is a good proxy for per-symbol work
+        return float(self.bars)
+
+    @property
+    def pass_rate(self) -> float:
+        evaluated, passed = _stats(self.key)
+        return (passed + 1) / (evaluated + 2)
+
+    def eval(self, df, memo: dict) -> bool:
+        hit = memo.get(self.key)
+        if hit is not None:
+            return hit
+
+        result = bool(self.fn(df))
+        memo[self.key] = result
+
+        st = _stats(self.key)
+        st[0] += 1
+        st[1] += result
+        return result
+
+    def vector(self, m: dict, memo: dict, record: bool = True) -> np.ndarray:
+        hit = memo.get(self.key)
+        if hit is not None:
+            return hit
+
+        mask = np.asarray(self.fn.vector(m), dtype=bool)
+        memo[self.key] = mask
+        if not record:
+            return mask
+
+        st = _stats(self.key)
+        st[0] += len(mask)
+        st[1] += int(mask.sum())
+        return mask
+
+    def optimize(self):
+        pass
+
+    def explain(self, depth: int = 0) -> list[str]:
+        evaluated, _ = _stats(self.key)
+        shared = f"  (shared x{self.refs})" if self.refs > 1 else ""
+        return [
+            f"{'  ' * depth}{self.key}  cost={self.cost:.0f} "
+            f"pass={self.pass_rate:.2f} n={evaluated} "
+            f"cols={self.columns}{shared}"
+        ]
+
+
+class Group:
+    def __init__(self, key: str, op: str, children: list):
+        self.key = key
+        self.op = op
+        self.children = children
+        self.columns = sorted({c for ch in children for c in ch.columns})
+        self.indicators = merge_indicators(*(ch.indicators for ch in children))
+        self.bars = max((ch.bars for ch in children), default=1)
+        self.refs = 1
+
+    @property
+    def cost(self) -> float:
+        """
+        Expected cost with the current child order
+        """
+        total = 0.0
+        reach = 1.0
+        for ch in self.children:
+            total += reach * ch.cost
+            p = ch.pass_rate
+            reach *= p if self.op == "AND" else (1 - p)
+        return total
+
+    @property
+    def pass_rate(self) -> float:
+        evaluated, passed = _stats(self.key)
+        return (passed + 1) / (evaluated + 2)
+
+    def eval(self, df, memo: dict) -> bool:
+        hit = memo.get(self.key)
+        if hit is not None:
+            return hit
+
+        if self.op == "AND":
+            result = all(ch.eval(df, memo) for ch in self.children)
+        else:
+            result = any(ch.eval(df, memo) for ch in self.children)
+
+        memo[self.key] = result
+
+        st = _stats(self.key)
+        st[0] += 1
+        st[1] += result
+        return result
+
+    def vector(self, m: dict, memo: dict, record: bool = True) -> np.ndarray:
+        hit = memo.get(self.key)
+        if hit is not None:
+            return hit
+
+        if self.op == "AND":
+            mask = np.ones(m["count"], dtype=bool)
+            for ch in self.children:
+                mask &= ch.vector(m, memo, record)
+                if not mask.any():
+                    break
+        else:
+            mask = np.zeros(m["count"], dtype=bool)
+            for ch in self.children:
+                mask |= ch.vector(m, memo, record)
+                if mask.all():
+                    break
+
+        memo[self.key] = mask
+        if not record:
+            return mask
+
+        st = _stats(self.key)
+        st[0] += len(mask)
+        st[1] += int(mask.sum())
+        return mask
+
+    def optimize(self):
+        for ch in self.children:
+            ch.optimize()
+
+        if self.op == "AND":
+            rank = lambda ch: ch.cost / max(1 - ch.pass_rate, 1e-9)
+        else:
+            rank = lambda ch: ch.cost / max(ch.pass_rate, 1e-9)
+
+        # swap in a new list: concurrent evaluations keep the old one
+        self.children = sorted(self.children, key=rank)
+
+    def explain(self, depth: int = 0) -> list[str]:
+        evaluated, _ = _stats(self.key)
+        shared = f"  (shared x{self.refs})" if self.refs > 1 else ""
+        lines = [
+            f"{'  ' * depth}{self.op}  cost={self.cost:.2f} "
+            f"pass={self.pass_rate:.2f} n={evaluated}{shared}"
+        ]
+        for ch in self.children:
+            lines.extend(ch.explain(depth + 1))
+        return lines
+
+
+# =====================================================
+# PLAN (THE rule_fn)
+# =====================================================
+class RulePlan:
+    def __init__(self, root, rule_json, nodes: dict):
+        self.root = root
+        self.rule_json = rule_json
+        self.nodes = nodes
+        self.columns = root.columns
+        self.indicators = root.indicators
+        self.bars = root.bars
+        # longest indicator warm-up + the extra trailing bars the rules
+        # read, e.g. rising_sma(200, lookback=5) -> 200 + 6 - 1 = 205
+        self.required_bars = indicator_warmup(self.indicators) + self.bars - 1
+        self._calls = 0
+        root.optimize()
+
+    def __call__(self, df) -> bool:
+        result = self.root.eval(df, {})
+
+        self._calls += 1
+        if self._calls % REORDER_EVERY == 0:
+            self.root.optimize()
+        return result
+
+    def vector(self, m: dict) -> np.ndarray:
+        mask = self.root.vector(m, {})
+        self.root.optimize()
+        return mask
+
+    def series(self, df) -> pd.Series:
+        """
+        Bool signal for every bar of df in one pass (historical mode).
+        Bars are not symbols: pass rates are not recorded and the plan
+        is not re-optimized.
+        """
+        if df.empty:
+            return pd.Series(False, index=df.index, dtype=bool)
+        mask = self.root.vector(bar_matrix(df, self.bars), {}, record=False)
+        return pd.Series(mask, index=df.index)
+
+    def optimize(self):
+        self.root.optimize()
+
+    def explain(self) -> str:
+        return "\n".join(self.root.explain())
+
+    def __repr__(self) -> str:
+        return f"RulePlan({self.root.key})"
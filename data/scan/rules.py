@@ -1,5 +1,7 @@
 # scan/rules.py
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 # =====================================================
 # INTERNAL HELPERS
@@ -17,6 +19,62 @@ def _prev(df: pd.DataFrame):
     return df.iloc[-2]
 
 
+# =====================================================
+# MATRIX HELPERS (VECTOR MODE)
+# =====================================================
+# A matrix is a dict of column -> 2D array (symbols x bars), right
+# aligned so [:, -1] is every symbol's last bar (NaN padded on the
+# left). Each rule's .vector(m) returns one bool per symbol and must
+# give the same answer as the per-DataFrame rule.
+
+def _none(m: dict) -> np.ndarray:
+    return np.zeros(m["count"], dtype=bool)
+
+
+def _at(m: dict, col: str, back: int = 0) -> np.ndarray:
+    return m[col][:, -1 - back]
+
+
+def bar_matrix(df: pd.DataFrame, bars: int) -> dict:
+    """
+    One matrix row per bar of df: row i holds bars i-bars+1 .. i
+    (NaN before the first bar), so .vector(m) answers the rule as of
+    EVERY bar in one call. Rows are strided views, nothing is copied
+    per bar.
+    """
+    n = len(df)
+    m = {"count": n, "length": np.arange(1, n + 1)}
+    pad = np.full(max(bars, 1) - 1, np.nan)
+
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=np.float64)
+        m[col] = sliding_window_view(np.concatenate([pad, values]), max(bars, 1))
+    return m
+
+
+def _series(vector, bars: int):
+    def series(df: pd.DataFrame) -> pd.Series:
+        """
+        Bool signal per bar (same answer as the rule on df up to that bar)
+        """
+        if df.empty:
+            return pd.Series(False, index=df.index, dtype=bool)
+        return pd.Series(vector(bar_matrix(df, bars)), index=df.index)
+
+    return series
+
+
+def _vectorized(rule, vector, bars: int = 1):
+    """
+    Attach the matrix form, the whole-series form and the number of
+    trailing bars they read
+    """
+    rule.vector = vector
+    rule.series = _series(vector, bars)
+    rule.bars = bars
+    return rule
+
+
 # =====================================================
 # PRICE NEAR MOVING AVERAGE
 # =====================================================
@@ -43,7 +101,16 @@ def near_ma(*, ma_col: str, tolerance_pct: float = 1.0):
         diff_pct = abs(price - ma) / ma * 100
         return diff_pct <= tolerance_pct
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if ma_col not in m:
+            return _none(m)
+
+        ma = _at(m, ma_col)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff_pct = np.abs(_at(m, "close") - ma) / ma * 100
+        return (ma != 0) & (diff_pct <= tolerance_pct)
+
+    return _vectorized(_rule, _vector)
 
 
 # =====================================================
@@ -70,7 +137,18 @@ def rising_ma(*, ma_col: str, lookback: int = 3):
             for i in range(1, len(recent))
         )
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if ma_col not in m:
+            return _none(m)
+
+        recent = m[ma_col][:, -(lookback + 1):]
+        if recent.shape[1] < lookback + 1:
+            return _none(m)
+
+        # NaN anywhere -> comparison False -> rule False
+        return (recent[:, 1:] > recent[:, :-1]).all(axis=1)
+
+    return _vectorized(_rule, _vector, bars=lookback + 1)
 
 
 # =====================================================
@@ -96,7 +174,16 @@ def crossing_up(*, ma_col: str):
             last["close"] > last[ma_col]
         )
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if ma_col not in m:
+            return _none(m)
+
+        return (
+            (_at(m, "close", 1) < _at(m, ma_col, 1)) &
+            (_at(m, "close") > _at(m, ma_col))
+        )
+
+    return _vectorized(_rule, _vector, bars=2)
 
 
 # =====================================================
@@ -114,7 +201,12 @@ def rsi_above(*, rsi_col: str, level: float):
 
         return last[rsi_col] > level
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if rsi_col not in m:
+            return _none(m)
+        return _at(m, rsi_col) > level
+
+    return _vectorized(_rule, _vector)
 
 
 def rsi_below(*, rsi_col: str, level: float):
@@ -128,7 +220,12 @@ def rsi_below(*, rsi_col: str, level: float):
 
         return last[rsi_col] < level
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if rsi_col not in m:
+            return _none(m)
+        return _at(m, rsi_col) < level
+
+    return _vectorized(_rule, _vector)
 
 
 # =====================================================
@@ -151,7 +248,16 @@ def macd_bullish(*, macd_col: str, signal_col: str):
             last[macd_col] > last[signal_col]
         )
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if macd_col not in m or signal_col not in m:
+            return _none(m)
+
+        return (
+            (_at(m, macd_col, 1) <= _at(m, signal_col, 1)) &
+            (_at(m, macd_col) > _at(m, signal_col))
+        )
+
+    return _vectorized(_rule, _vector, bars=2)
 
 
 # =====================================================
@@ -164,7 +270,11 @@ def close_above_open():
         if last is None:
             return False
         return last["close"] > last["open"]
-    return _rule
+
+    def _vector(m: dict) -> np.ndarray:
+        return _at(m, "close") > _at(m, "open")
+
+    return _vectorized(_rule, _vector)
 
 
 def close_above_prev_close():
@@ -174,7 +284,11 @@ def close_above_prev_close():
         if last is None or prev is None:
             return False
         return last["close"] > prev["close"]
-    return _rule
+
+    def _vector(m: dict) -> np.ndarray:
+        return _at(m, "close") > _at(m, "close", 1)
+
+    return _vectorized(_rule, _vector, bars=2)
 
 
 def close_near_high(*, tolerance_pct: float = 1.0):
@@ -192,7 +306,13 @@ def close_near_high(*, tolerance_pct: float = 1.0):
         diff_pct = abs(high - close) / high * 100
         return diff_pct <= tolerance_pct
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        high = _at(m, "high")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff_pct = np.abs(high - _at(m, "close")) / high * 100
+        return (high != 0) & (diff_pct <= tolerance_pct)
+
+    return _vectorized(_rule, _vector)
 
 
 def range_above_pct(*, min_pct: float):
@@ -205,7 +325,13 @@ def range_above_pct(*, min_pct: float):
         pct = (rng / last["close"]) * 100
         return pct >= min_pct
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        rng = _at(m, "high") - _at(m, "low")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (rng / _at(m, "close")) * 100
+        return pct >= min_pct
+
+    return _vectorized(_rule, _vector)
 
 
 # =====================================================
@@ -240,7 +366,16 @@ def close_near_sma(*, period: int, tolerance_pct: float = 1.0):
 
         return diff_pct <= tolerance_pct
 
-    return _rule
+    def _vector(m: dict) -> np.ndarray:
+        if sma_col not in m:
+            return _none(m)
+
+        sma_value = _at(m, sma_col)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff_pct = np.abs(_at(m, "close") - sma_value) / sma_value * 100
+        return diff_pct <= tolerance_pct
+
+    return _vectorized(_rule, _vector)
 
 
 
@@ -249,13 +384,31 @@ def close_near_sma(*, period: int, tolerance_pct: float = 1.0):
 # LOGICAL COMBINATORS (NESTABLE)
 # =====================================================
 
+def _combine_bars(rules) -> int:
+    return max((getattr(r, "bars", 1) for r in rules), default=1)
+
+
 def AND(*rules):
     def _and(df: pd.DataFrame) -> bool:
         return all(rule(df) for rule in rules)
-    return _and
+
+    def _vector(m: dict) -> np.ndarray:
+        mask = np.ones(m["count"], dtype=bool)
+        for rule in rules:
+            mask &= rule.vector(m)
+        return mask
+
+    return _vectorized(_and, _vector, bars=_combine_bars(rules))
 
 
 def OR(*rules):
     def _or(df: pd.DataFrame) -> bool:
         return any(rule(df) for rule in rules)
-    return _or
+
+    def _vector(m: dict) -> np.ndarray:
+        mask = np.zeros(m["count"], dtype=bool)
+        for rule in rules:
+            mask |= rule.vector(m)
+        return mask
+
+    return _vectorized(_or, _vector, bars=_combine_bars(rules))
@@ -1,22 +1,22 @@
 RULE_DEFINITIONS = {
-    "close_near_sma": {
+    "near_sma": {
         "required": ["period"],
-        "optional": ["tolerance"],
+        "optional": ["tolerance_pct"],
     },
-    "rising_ma": {
-        "required": ["ma"],
+    "rising_sma": {
+        "required": ["period"],
         "optional": ["lookback"],
     },
-    "crossing_up": {
-        "required": ["ma"],
+    "crossing_sma": {
+        "required": ["period"],
         "optional": [],
     },
     "rsi_above": {
-        "required": ["rsi", "level"],
+        "required": ["period", "level"],
         "optional": [],
     },
-    "close_above_open": {
-        "required": [],
+    "rsi_below": {
+        "required": ["period", "level"],
         "optional": [],
     },
 }
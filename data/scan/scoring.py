@@ -0,0 +1,114 @@
+# scan/scoring.py
+
+"""
+Scoring expressions for ranked (top-K) scans.
+
+Same JSON shape as a leaf rule:
+
+    {"sma_distance": {"period": 50}}          % above / below SMA(period)
+    {"rsi": {"period": 14}}                   RSI value
+    {"volume_ratio": {"period": 20}}          volume / avg of previous N bars
+    {"pct_change": {"bars": 1}}               % change over N candles
+
+A scorer is score_fn(df) -> float (NaN = cannot be ranked) and carries
+the indicators it needs (.indicators) and the trailing candles it reads
+(.bars), exactly like a compiled rule.
+"""
+
+import math
+
+from scan.indicators import sma_col, rsi_col
+
+NAN = float("nan")
+
+
+def _scorer(fn, indicators: dict, bars: int = 1):
+    fn.indicators = indicators
+    fn.bars = bars
+    return fn
+
+
+# =====================================================
+# SCORE FUNCTIONS
+# =====================================================
+
+def sma_distance(*, period: int, absolute: bool = False):
+    col = sma_col(period)
+
+    def _score(df) -> float:
+        ma = df[col].iat[-1]
+        if ma != ma or ma == 0:
+            return NAN
+        dist = (df["close"].iat[-1] - ma) / ma * 100
+        return abs(dist) if absolute else dist
+
+    return _scorer(_score, {"sma": [period]})
+
+
+def rsi_value(*, period: int = 14):
+    col = rsi_col(period)
+
+    def _score(df) -> float:
+        return float(df[col].iat[-1])
+
+    return _scorer(_score, {"rsi": [period]})
+
+
+def volume_ratio(*, period: int = 20):
+    def _score(df) -> float:
+        volume = df["volume"].to_numpy()
+        if len(volume) < period + 1:
+            return NAN
+        avg = volume[-period - 1:-1].mean()
+        return float(volume[-1] / avg) if avg else NAN
+
+    return _scorer(_score, {}, bars=period + 1)
+
+
+def pct_change(*, bars: int = 1):
+    def _score(df) -> float:
+        close = df["close"].to_numpy()
+        if len(close) < bars + 1 or not close[-1 - bars]:
+            return NAN
+        return float((close[-1] / close[-1 - bars] - 1) * 100)
+
+    return _scorer(_score, {}, bars=bars + 1)
+
+
+# =====================================================
+# REGISTRY
+# =====================================================
+
+SCORE_MAP = {
+    "sma_distance": lambda cfg: sma_distance(
+        period=cfg["period"],
+        absolute=cfg.get("absolute", False),
+    ),
+    "rsi": lambda cfg: rsi_value(period=cfg.get("period", 14)),
+    "volume_ratio": lambda cfg: volume_ratio(period=cfg.get("period", 20)),
+    "pct_change": lambda cfg: pct_change(bars=cfg.get("bars", 1)),
+}
+
+
+def build_score(score_json):
+    """
+    {"name": {config}} -> score_fn
+    """
+    if not isinstance(score_json, dict) or len(score_json) != 1:
+        raise ValueError(f"Invalid score format: {score_json}")
+
+    name, cfg = next(iter(score_json.items()))
+
+    if name not in SCORE_MAP:
+        raise ValueError(f"Unknown score: {name}")
+    if not isinstance(cfg, dict):
+        raise ValueError(f"Score config must be object for {name}")
+
+    try:
+        return SCORE_MAP[name](cfg)
+    except KeyError as e:
+        raise ValueError(f"Missing required {e} in score {name}")
+
+
+def is_rankable(value) -> bool:
+    return value is not None and not math.isnan(value)
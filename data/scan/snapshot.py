@@ -0,0 +1,238 @@
+# scan/snapshot.py
+
+"""
+Materialized latest-indicator snapshot.
+
+After every data update `latest_snapshot` is rebuilt with ONE row per
+(symbol, timeframe):
+
+    bars, last_day                      candle count, last DAILY bar
+    open ... volume, SMA_20, ...        last candle
+    prev_open ... prev_SMA_20, ...      candle before it
+
+Values are computed for all symbols at once with the vector-mode
+matrix code over full history. Scans whose rule reads at most
+SNAPSHOT_BARS candles and only snapshot columns are answered from this
+table with a single vectorized rule call; everything else (or any
+symbol whose snapshot is behind the price panel) falls back to the
+normal engine.
+"""
+
+import numpy as np
+import pandas as pd
+
+from db import get_connection
+from scan.panel import get_panel
+from scan.state import TRACKED_INDICATORS, TRACKED_TIMEFRAMES
+from scan.utils import merge_indicators
+from scan.vector import apply_matrix_indicators, build_matrix
+
+# =====================================================
+# CONFIG
+# =====================================================
+SNAPSHOT_TIMEFRAMES = TRACKED_TIMEFRAMES
+SNAPSHOT_INDICATORS = merge_indicators(TRACKED_INDICATORS)
+SNAPSHOT_BARS = 2
+
+# tf -> (snapshot version, matrix)
+_LOADED: dict[str, tuple] = {}
+_VERSION = 0
+
+
+def _prev(col: str) -> str:
+    return f"prev_{col}"
+
+
+def _last_days(panel: dict, symbols: list[str]) -> np.ndarray:
+    """
+    Last DAILY bar per symbol (-1 = no data)
+    """
+    if len(panel["length"]) == 0:
+        return np.full(len(symbols), -1, dtype=np.int64)
+
+    rows = np.array([panel["index"].get(s, -1) for s in symbols], dtype=np.int64)
+    known = rows >= 0
+    length = np.where(known, panel["length"][rows], 0)
+    last = panel["offset"][rows] + length - 1
+
+    out = np.full(len(rows), -1, dtype=np.int64)
+    ok = known & (length > 0)
+    out[ok] = panel["date"][last[ok]]
+    return out
+
+
+# =====================================================
+# BUILD (AFTER EVERY UPDATE)
+# =====================================================
+def refresh_snapshot() -> int:
+    """
+    Rebuild latest_snapshot from the price panel (atomic table swap).
+    Returns rows written.
+    """
+    global _VERSION
+
+    panel = get_panel()
+    frames = []
+
+    for tf in SNAPSHOT_TIMEFRAMES:
+        m = build_matrix(panel["symbols"], tf, SNAPSHOT_BARS)
+        if m["count"] == 0:
+            continue
+
+        m = apply_matrix_indicators(m, SNAPSHOT_INDICATORS, SNAPSHOT_BARS, tail=False)
+
+        df = pd.DataFrame({
+            "symbol": m["symbols"],
+            "timeframe": tf,
+            "bars": m["length"],
+            "last_day": _last_days(panel, m["symbols"]),
+        })
+        for col, arr in m.items():
+            if isinstance(arr, np.ndarray) and arr.ndim == 2:
+                df[col] = arr[:, -1]
+                df[_prev(col)] = arr[:, -2]
+
+        frames.append(df)
+
+    if not frames:
+        return 0
+
+    out = pd.concat(frames, ignore_index=True)
+
+    columns = ", ".join(f'"{c}"' for c in out.columns)
+    params = ", ".join("?" * len(out.columns))
+
+    # load + swap in ONE transaction: readers see the old table or the
+    # new one, never neither (to_sql commits on its own, so no to_sql)
+    with get_connection(write=True) as conn:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("DROP TABLE IF EXISTS latest_snapshot_new")
+        cur.execute(pd.io.sql.get_schema(out, "latest_snapshot_new"))
+        cur.executemany(
+            f"INSERT INTO latest_snapshot_new ({columns}) VALUES ({params})",
+            out.itertuples(index=False, name=None),
+        )
+        cur.execute("DROP TABLE IF EXISTS latest_snapshot")
+        cur.execute("ALTER TABLE latest_snapshot_new RENAME TO latest_snapshot")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_snapshot_tf ON latest_snapshot(timeframe)"
+        )
+
+    _VERSION += 1
+    _LOADED.clear()
+    print(f"[SNAPSHOT] {len(out)} rows")
+    return len(out)
+
+
+# =====================================================
+# READ
+# =====================================================
+def _load(tf: str) -> dict | None:
+    hit = _LOADED.get(tf)
+    if hit is not None and hit[0] == _VERSION:
+        return hit[1]
+
+    try:
+        conn = get_connection()
+        df = pd.read_sql_query(
+            "SELECT * FROM latest_snapshot WHERE timeframe = ?",
+            conn,
+            params=(tf,),
+        )
+        conn.close()
+    except Exception:
+        return None  # never built
+
+    if df.empty:
+        return None
+
+    m = {
+        "symbols": df["symbol"].tolist(),
+        "index": {s: i for i, s in enumerate(df["symbol"])},
+        "count": len(df),
+        "length": df["bars"].to_numpy(dtype=np.int64),
+        "last_day": df["last_day"].to_numpy(dtype=np.int64),
+    }
+    for col in df.columns:
+        if col.startswith("prev_") or col in ("symbol", "timeframe", "bars", "last_day"):
+            continue
+        m[col] = np.column_stack([
+            df[_prev(col)].to_numpy(dtype=np.float64),
+            df[col].to_numpy(dtype=np.float64),
+        ])
+
+    _LOADED[tf] = (_VERSION, m)
+    return m
+
+
+def scan_snapshot(symbols: list[str], timeframe: str, rule_fn,
+                  indicator_config: dict, min_bars: int):
+    """
+    Answer a scan from latest_snapshot.
+
+    Returns (matches, pending): `pending` are symbols the snapshot could
+    not answer (missing or behind the panel) -> run them normally.
+    Returns None when the rule cannot be answered from the snapshot.
+    """
+    vector = getattr(rule_fn, "vector", None)
+    columns = getattr(rule_fn, "columns", None)
+
+    if vector is None or columns is None:
+        return None
+    if getattr(rule_fn, "bars", SNAPSHOT_BARS + 1) > SNAPSHOT_BARS:
+        return None
+    if merge_indicators(SNAPSHOT_INDICATORS, indicator_config) != SNAPSHOT_INDICATORS:
+        return None
+
+    snap = _load(timeframe)
+    if snap is None or any(c not in snap for c in columns):
+        return None
+
+    # only symbols whose snapshot is at the panel's last bar
+    current = _last_days(get_panel(), symbols)
+    rows, pending = [], []
+    for s, last in zip(symbols, current):
+        i = snap["index"].get(s)
+        if i is None or last < 0 or snap["last_day"][i] != last:
+            pending.append(s)
+        else:
+            rows.append(i)
+
+    rows = np.array(rows, dtype=np.int64)
+
+    m = {
+        col: (arr[rows] if isinstance(arr, np.ndarray) else arr)
+        for col, arr in snap.items()
+        if col not in ("symbols", "index")
+    }
+    m["count"] = len(rows)
+
+    if not len(rows):
+        return [], pending
+
+    mask = vector(m)
+    mask &= (m["length"] > 0) & (m["length"] >= min_bars)
+
+    matches = [snap["symbols"][i] for i, ok in zip(rows, mask) if ok]
+    return matches, pending
+
+
+def snapshot_rows(symbols: list[str], timeframe: str,
+                  columns: list[str]) -> dict[str, dict]:
+    """
+    {symbol: {column: [prev, last]}} for symbols whose snapshot is at
+    the panel's last bar and holds every requested column.
+    """
+    snap = _load(timeframe)
+    if snap is None or any(c not in snap for c in columns):
+        return {}
+
+    current = _last_days(get_panel(), symbols)
+    out = {}
+    for s, last in zip(symbols, current):
+        i = snap["index"].get(s)
+        if i is None or last < 0 or snap["last_day"][i] != last:
+            continue
+        out[s] = {col: snap[col][i] for col in columns}
+    return out
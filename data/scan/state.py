@@ -0,0 +1,438 @@
+# scan/state.py
+
+"""
+Incremental indicator state.
+
+One row per (symbol, timeframe, indicator, params) in `indicator_state`
+holds everything needed to produce the NEXT value without history:
+
+    SMA  -> the last `period` closes (rolling window)
+    EMA  -> last EMA value
+    RSI  -> previous close + rolling gain / loss windows
+    MACD -> fast / slow / signal EMAs
+
+plus the last STATE_HISTORY indicator values (what rules read).
+
+Timeframes: `base` is the state after the last CLOSED candle, `close`
+is the in-progress candle. A daily bar in the same week / month only
+re-peeks the in-progress value; a bar in a new period commits the old
+candle first. Every step is O(1) in history length.
+
+Writers: engine/fetch_data.py (save_to_db) advances state as candles
+land; missing rows are bootstrapped once from full history.
+Readers: run_scan attaches the stored values instead of recomputing.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from scan.indicators import (
+    sma_col,
+    ema_col,
+    rsi_col,
+    macd_cols,
+    macd_hist_col,
+)
+from scan.panel import (
+    decode_dates,
+    period_ids,
+    get_panel,
+    get_tf_panel,
+    get_prices,
+    last_day,
+    symbol_slice,
+)
+
+# =====================================================
+# CONFIG
+# =====================================================
+TRACKED_TIMEFRAMES = ("1D", "1W", "1M")
+
+TRACKED_INDICATORS = {
+    "sma": [20, 50, 200],
+    "ema": [20, 50],
+    "rsi": [14],
+    "macd": [[12, 26, 9]],
+}
+
+# indicator values kept per state (max trailing bars a rule may read)
+STATE_HISTORY = 10
+
+NAN = float("nan")
+
+
+def tracked_configs():
+    for tf in TRACKED_TIMEFRAMES:
+        for kind, params in TRACKED_INDICATORS.items():
+            for p in params:
+                yield tf, kind, p
+
+
+def _params_key(params) -> str:
+    return json.dumps(params)
+
+
+# =====================================================
+# PURE STEP FUNCTIONS (same math as scan/indicators.py)
+# =====================================================
+def _ema_step(prev, close: float, span: int) -> float:
+    # pandas ewm(span, adjust=False)
+    if prev is None or prev != prev:
+        return close
+    if prev == close:
+        return prev
+    alpha = 2.0 / (span + 1.0)
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * close) / (old_wt + alpha)
+
+
+def step(kind: str, params, base: dict, close: float):
+    """
+    (state after previous candle, this candle's close)
+        -> (state after this candle, {column: value})
+
+    Pure: `base` is never mutated.
+    """
+    if kind == "sma":
+        window = (base["window"] + [close])[-params:]
+        value = sum(window) / params if len(window) == params else NAN
+        return {"window": window}, {sma_col(params): value}
+
+    if kind == "ema":
+        value = _ema_step(base["ema"], close, params)
+        return {"ema": value}, {ema_col(params): value}
+
+    if kind == "rsi":
+        gains, losses = base["gains"], base["losses"]
+        if base["prev"] is not None:
+            delta = close - base["prev"]
+            gains = (gains + [max(delta, 0.0)])[-params:]
+            losses = (losses + [max(-delta, 0.0)])[-params:]
+
+        value = NAN
+        if len(gains) == params:
+            avg_gain = sum(gains) / params
+            avg_loss = sum(losses) / params
+            if avg_loss:
+                value = 100 - (100 / (1 + avg_gain / avg_loss))
+            elif avg_gain:
+                value = 100.0
+
+        return (
+            {"prev": close, "gains": gains, "losses": losses},
+            {rsi_col(params): value},
+        )
+
+    if kind == "macd":
+        fast, slow, signal = params
+        f = _ema_step(base["fast"], close, fast)
+        s = _ema_step(base["slow"], close, slow)
+        macd = f - s
+        sig = _ema_step(base["signal"], macd, signal)
+
+        macd_col, signal_col = macd_cols(fast, slow, signal)
+        return (
+            {"fast": f, "slow": s, "signal": sig},
+            {
+                macd_col: macd,
+                signal_col: sig,
+                macd_hist_col(fast, slow, signal): macd - sig,
+            },
+        )
+
+    raise ValueError(f"Unsupported indicator: {kind}")
+
+
+def _bootstrap(kind: str, params, closes: np.ndarray) -> dict:
+    """
+    State after `closes`, computed vectorized (one pass, any length)
+    """
+    n = len(closes)
+    series = pd.Series(closes, dtype=np.float64)
+
+    def last_ema(values: pd.Series, span: int):
+        if values.empty:
+            return None
+        return float(values.ewm(span=span, adjust=False).mean().iloc[-1])
+
+    if kind == "sma":
+        return {"window": closes[-params:].tolist() if n else []}
+
+    if kind == "ema":
+        return {"ema": last_ema(series, params)}
+
+    if kind == "rsi":
+        delta = np.diff(closes[-(params + 1):])
+        return {
+            "prev": float(closes[-1]) if n else None,
+            "gains": np.clip(delta, 0, None).tolist(),
+            "losses": (-np.clip(delta, None, 0)).tolist(),
+        }
+
+    if kind == "macd":
+        fast, slow, signal = params
+        if not n:
+            return {"fast": None, "slow": None, "signal": None}
+
+        ema_fast = series.ewm(span=fast, adjust=False).mean()
+        ema_slow = series.ewm(span=slow, adjust=False).mean()
+        macd = ema_fast - ema_slow
+        return {
+            "fast": float(ema_fast.iloc[-1]),
+            "slow": float(ema_slow.iloc[-1]),
+            "signal": last_ema(macd, signal),
+        }
+
+    raise ValueError(f"Unsupported indicator: {kind}")
+
+
+# =====================================================
+# BUILD / ADVANCE
+# =====================================================
+def _day_str(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def build_state(kind: str, params, tf: str,
+                days: np.ndarray, closes: np.ndarray) -> dict | None:
+    """
+    Fresh state from a symbol's full daily history
+    """
+    if not len(days):
+        return None
+
+    pid, _ = period_ids(days, tf)
+    ends = np.flatnonzero(np.append(pid[1:] != pid[:-1], True))
+    tf_closes = closes[ends]
+
+    head = tf_closes[:-STATE_HISTORY]
+    recent = tf_closes[-STATE_HISTORY:]
+
+    base = _bootstrap(kind, params, head)
+    values: dict[str, list] = {}
+
+    for i, close in enumerate(recent):
+        new_base, out = step(kind, params, base, float(close))
+        if i < len(recent) - 1:
+            base = new_base  # closed candle -> commit
+        for col, v in out.items():
+            values.setdefault(col, []).append(v)
+
+    return {
+        "last_date": _day_str(days[-1]),
+        "period": int(pid[-1]),
+        "close": float(recent[-1]),
+        "base": base,
+        "values": values,
+    }
+
+
+def advance(state: dict, kind: str, params, tf: str,
+            day: int, close: float) -> dict:
+    """
+    Apply ONE new daily bar (in place)
+    """
+    pid = int(period_ids(np.array([day]), tf)[0][0])
+    new_period = pid != state["period"]
+
+    if new_period:
+        state["base"], _ = step(kind, params, state["base"], state["close"])
+        state["period"] = pid
+
+    state["close"] = close
+    _, out = step(kind, params, state["base"], close)
+
+    for col, v in out.items():
+        vals = state["values"].setdefault(col, [])
+        if new_period or not vals:
+            vals.append(v)
+        else:
+            vals[-1] = v
+        del vals[:-STATE_HISTORY]
+
+    state["last_date"] = _day_str(day)
+    return state
+
+
+# =====================================================
+# PERSISTENCE (WRITER SIDE)
+# =====================================================
+def ensure_state_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_state (
+            symbol TEXT,
+            timeframe TEXT,
+            indicator TEXT,
+            params TEXT,
+            last_date TEXT,
+            state TEXT,
+            vals TEXT,
+            PRIMARY KEY (symbol, timeframe, indicator, params)
+        )
+    """)
+
+
+def _read_history(conn, symbol: str):
+    df = pd.read_sql_query(
+        "SELECT date, close FROM prices WHERE symbol = ? ORDER BY date",
+        conn,
+        params=(symbol,),
+    )
+    days = decode_dates(df["date"]).astype(np.int64)
+    return days, df["close"].to_numpy(dtype=np.float64)
+
+
+def update_symbol_state(conn, symbol: str, records: list[tuple]) -> int:
+    """
+    Advance every tracked state of `symbol` with newly stored daily
+    bars. records: [(YYYY-MM-DD, close), ...] ascending.
+
+    Uses the caller's connection (same transaction as the price insert).
+    Returns the number of state rows written.
+    """
+    ensure_state_table(conn)
+    cur = conn.cursor()
+
+    cur.execute(
+        "SELECT timeframe, indicator, params, state FROM indicator_state "
+        "WHERE symbol = ?",
+        (symbol,),
+    )
+    existing = {(tf, ind, p): json.loads(st) for tf, ind, p, st in cur.fetchall()}
+
+    bars = [
+        (int(np.datetime64(d, "D").astype(np.int64)), float(c), d)
+        for d, c in records
+    ]
+
+    history = None
+    rows = []
+
+    for tf, kind, params in tracked_configs():
+        key = _params_key(params)
+        state = existing.get((tf, kind, key))
+
+        if state is None:
+            if history is None:
+                history = _read_history(conn, symbol)
+            state = build_state(kind, params, tf, *history)
+            if state is None:
+                continue
+        else:
+            for day, close, date in bars:
+                if date > state["last_date"]:
+                    advance(state, kind, params, tf, day, close)
+
+        rows.append((
+            symbol, tf, kind, key, state["last_date"],
+            json.dumps(state), json.dumps(state["values"]),
+        ))
+
+    cur.executemany("""
+        INSERT OR REPLACE INTO indicator_state
+        (symbol, timeframe, indicator, params, last_date, state, vals)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    return len(rows)
+
+
+# =====================================================
+# SCAN SIDE (READER)
+# =====================================================
+# tf -> (panel version, {symbol: {(indicator, params): (last_day, values)}})
+_LOADED: dict[str, tuple] = {}
+
+
+def _load_tf(tf: str) -> dict:
+    from db import get_connection
+
+    version = get_panel()["version"]
+    hit = _LOADED.get(tf)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+
+    out: dict[str, dict] = {}
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT symbol, indicator, params, last_date, vals "
+            "FROM indicator_state WHERE timeframe = ?",
+            (tf,),
+        )
+        rows = cur.fetchall()
+        conn.close()
+    except Exception:
+        rows = []  # table not created yet
+
+    for symbol, kind, params, last_date, vals in rows:
+        day = int(np.datetime64(last_date, "D").astype(np.int64))
+        out.setdefault(symbol, {})[(kind, params)] = (day, json.loads(vals))
+
+    _LOADED[tf] = (version, out)
+    return out
+
+
+def load_states(tf: str, indicator_config: dict, rule_bars: int) -> dict:
+    """
+    {symbol: {"last_day": int, "columns": {col: [values]}}} for every
+    symbol whose stored state covers ALL indicators in the config.
+    Empty when the config / rule needs something that is not tracked.
+    """
+    if tf not in TRACKED_TIMEFRAMES or rule_bars > STATE_HISTORY:
+        return {}
+
+    needed = []
+    for kind, params in indicator_config.items():
+        tracked = TRACKED_INDICATORS.get(kind, [])
+        for p in params:
+            p = list(p) if isinstance(p, (list, tuple)) else p
+            if p not in tracked:
+                return {}
+            needed.append((kind, _params_key(p)))
+
+    if not needed:
+        return {}
+
+    states = {}
+    for symbol, entries in _load_tf(tf).items():
+        days = set()
+        columns = {}
+        for key in needed:
+            hit = entries.get(key)
+            if hit is None:
+                break
+            days.add(hit[0])
+            columns.update(hit[1])
+        else:
+            # all indicators must be advanced to the same bar
+            if len(days) == 1:
+                states[symbol] = {"last_day": days.pop(), "columns": columns}
+    return states
+
+
+def state_frame(symbol: str, tf: str, entry: dict, min_bars: int):
+    """
+    Trailing candles + stored indicator values, or None when the state
+    is not in sync with the panel (caller recomputes).
+    """
+    if entry["last_day"] != last_day(symbol):
+        return None
+
+    bounds = symbol_slice(symbol, get_tf_panel(tf))
+    if bounds is None or bounds[1] - bounds[0] < max(min_bars, 1):
+        return None
+
+    df = get_prices(symbol, limit=STATE_HISTORY, tf=tf)
+    n = len(df)
+
+    for col, vals in entry["columns"].items():
+        arr = np.full(n, np.nan)
+        k = min(n, len(vals))
+        if k:
+            arr[n - k:] = vals[-k:]
+        df[col] = arr
+
+    return df
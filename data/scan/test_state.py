@@ -0,0 +1,110 @@
+print(">>> test_state started")
+
+import numpy as np
+
+from db import get_connection
+from scan.engine import apply_indicators, get_tf_candles, load_prices
+from scan.panel import last_day
+from scan.state import (
+    STATE_HISTORY,
+    advance,
+    build_state,
+    state_frame,
+    tracked_configs,
+)
+
+# -----------------------------------------------------
+# LOAD A SAMPLE OF STOCKS
+# -----------------------------------------------------
+def get_all_symbols(limit=50):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT symbol FROM symbols WHERE active = 1 LIMIT ?", (limit,))
+    symbols = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return symbols
+
+
+symbols = get_all_symbols()
+print(f"Checking indicator state on {len(symbols)} stocks")
+
+# daily bars replayed with advance(): a partial week, then one that
+# crosses a week and (usually) a month boundary
+ADVANCE_BARS = [3, 25]
+
+# EMA / RSI states are bootstrapped; allow float noise only
+RTOL = 1e-6
+
+# -----------------------------------------------------
+# HELPERS
+# -----------------------------------------------------
+def reference(daily, tf, kind, params):
+    """
+    Indicator columns recomputed over full history (the slow path)
+    """
+    candles = get_tf_candles(daily, tf)
+    return apply_indicators(candles, {kind: [params]})
+
+
+def compare(label, frame, ref):
+    """
+    Stored columns of `frame` vs the recomputed ones, last
+    STATE_HISTORY candles
+    """
+    bad = []
+    for col in frame.columns:
+        if col not in ref.columns or col in ("open", "high", "low", "close", "volume"):
+            continue
+        got = frame[col].to_numpy(dtype=np.float64)[-STATE_HISTORY:]
+        want = ref[col].to_numpy(dtype=np.float64)[-len(got):]
+        if not np.allclose(got, want, rtol=RTOL, equal_nan=True):
+            bad.append(col)
+    if bad:
+        print(f"FAIL {label} {bad}")
+    return not bad
+
+
+def as_entry(symbol, state):
+    return {"last_day": last_day(symbol), "columns": state["values"]}
+
+
+# -----------------------------------------------------
+# BUILD FROM HISTORY + ADVANCE, VS FULL RECOMPUTE
+# -----------------------------------------------------
+checks = 0
+failures = 0
+
+for symbol in symbols:
+    daily = load_prices(symbol)
+    if daily.empty:
+        continue
+
+    days = daily.index.values.astype("datetime64[D]").astype(np.int64)
+    closes = daily["close"].to_numpy(dtype=np.float64)
+
+    for tf, kind, params in tracked_configs():
+        ref = reference(daily, tf, kind, params)
+
+        # ---------- FRESH STATE ----------
+        state = build_state(kind, params, tf, days, closes)
+        frame = state_frame(symbol, tf, as_entry(symbol, state), min_bars=1)
+        checks += 1
+        if frame is None or not compare(f"{symbol} {tf} {kind}{params} build", frame, ref):
+            failures += 1
+
+        # ---------- STATE ADVANCED BAR BY BAR ----------
+        for n in ADVANCE_BARS:
+            if len(days) <= n:
+                continue
+            state = build_state(kind, params, tf, days[:-n], closes[:-n])
+            for day, close in zip(days[-n:], closes[-n:]):
+                advance(state, kind, params, tf, int(day), float(close))
+
+            frame = state_frame(symbol, tf, as_entry(symbol, state), min_bars=1)
+            checks += 1
+            label = f"{symbol} {tf} {kind}{params} advance x{n}"
+            if frame is None or not compare(label, frame, ref):
+                failures += 1
+
+print("CHECKS  :", checks)
+print("FAILURES:", failures)
@@ -0,0 +1,83 @@
+print(">>> test_vector started")
+
+from db import get_connection
+from scan.builder import build_rule
+from scan.cache import clear_cache
+from scan.engine import run_scan
+
+# -----------------------------------------------------
+# CLEAR CACHE (IMPORTANT FOR TESTING)
+# -----------------------------------------------------
+clear_cache()
+
+# -----------------------------------------------------
+# LOAD FULL DATASET (ALL NSE STOCKS)
+# -----------------------------------------------------
+def get_all_symbols():
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT symbol FROM symbols WHERE active = 1")
+    symbols = [r[0] for r in cur.fetchall()]
+    conn.close()
+    return symbols
+
+
+symbols = get_all_symbols()
+print(f"Comparing loop vs vector on {len(symbols)} stocks")
+
+# -----------------------------------------------------
+# EVERY RULE THE BUILDER KNOWS (+ AND / OR)
+# -----------------------------------------------------
+RULES = [
+    {"near_sma": {"period": 20, "tolerance_pct": 1.0}},
+    {"rising_sma": {"period": 50, "lookback": 3}},
+    {"crossing_sma": {"period": 20}},
+    {"rsi_above": {"period": 14, "level": 60}},
+    {"rsi_below": {"period": 14, "level": 40}},
+    {"AND": [
+        {"near_sma": {"period": 50, "tolerance_pct": 3.0}},
+        {"rsi_above": {"period": 14, "level": 50}},
+    ]},
+    {"OR": [
+        {"crossing_sma": {"period": 20}},
+        {"rising_sma": {"period": 200, "lookback": 5}},
+    ]},
+]
+
+TIMEFRAMES = ["1D", "1W", "1M"]
+
+# -----------------------------------------------------
+# RUN BOTH MODES, COMPARE MASKS
+# -----------------------------------------------------
+failures = 0
+
+for timeframe in TIMEFRAMES:
+    for rule_json in RULES:
+        rule_fn = build_rule(rule_json)
+        min_bars = max(rule_fn.required_bars, 50)
+
+        masks = {}
+        for mode in ("loop", "vector"):
+            matches = set(run_scan(
+                symbols=symbols,
+                timeframe=timeframe,
+                indicator_config=None,
+                rule_fn=rule_fn,
+                min_bars=min_bars,
+                mode=mode,
+                snapshot=False,
+            ))
+            masks[mode] = [s in matches for s in symbols]
+
+        diff = [
+            s for s, a, b in zip(symbols, masks["loop"], masks["vector"])
+            if a != b
+        ]
+        status = "OK  " if not diff else "FAIL"
+        print(f"{status} {timeframe} {rule_json} "
+              f"matches={sum(masks['loop'])} diff={len(diff)}")
+        if diff:
+            failures += 1
+            print("     first mismatches:", diff[:10])
+
+print("TOTAL FAILURES:", failures)
@@ -4,6 +4,12 @@
 Utility helpers for scan engine
 """
 
+import math
+
+# Seeding an EMA n bars back leaves at most (1 - alpha)^n of the seed
+# error in today's value; this is the error we accept in tail mode.
+EMA_CONVERGENCE_EPS = 1e-6
+
 def required_bars(indicator_config: dict) -> int:
     """
     Calculate minimum bars required based on indicators
@@ -14,6 +20,15 @@ def required_bars(indicator_config: dict) -> int:
         MACD(12,26,9) -> needs 26 bars
     """
 
+    # add buffer for safety
+    return indicator_warmup(indicator_config) + 5
+
+
+def indicator_warmup(indicator_config: dict) -> int:
+    """
+    Longest indicator period in the config (no safety buffer)
+    """
+
     bars = 0
 
     # SMA
@@ -32,5 +47,67 @@ def required_bars(indicator_config: dict) -> int:
     for fast, slow, signal in indicator_config.get("macd", []):
         bars = max(bars, slow)
 
-    # add buffer for safety
-    return bars + 5
+    return bars
+
+
+def ema_warmup(span: int) -> int:
+    """
+    Bars an EMA(span) needs before the seed's weight < EMA_CONVERGENCE_EPS
+    """
+    alpha = 2.0 / (span + 1.0)
+    if alpha >= 1:
+        return 1
+    return math.ceil(math.log(EMA_CONVERGENCE_EPS) / math.log(1 - alpha))
+
+
+def tail_bars(indicator_config: dict, rule_bars: int = 1) -> int:
+    """
+    Trailing candles needed so the last `rule_bars` values of every
+    indicator match a full-history computation:
+
+        SMA p          -> p + rule_bars - 1           (exact)
+        RSI p          -> p + rule_bars               (exact, needs diff)
+        EMA s          -> warmup(s) + rule_bars       (within EPS)
+        MACD(f, s, g)  -> warmup(s) + warmup(g) + rule_bars
+    """
+    bars = rule_bars
+
+    for p in indicator_config.get("sma", []):
+        bars = max(bars, p + rule_bars - 1)
+
+    for p in indicator_config.get("rsi", []):
+        bars = max(bars, p + rule_bars)
+
+    for p in indicator_config.get("ema", []):
+        bars = max(bars, ema_warmup(p) + rule_bars)
+
+    for fast, slow, signal in indicator_config.get("macd", []):
+        bars = max(bars, ema_warmup(slow) + ema_warmup(signal) + rule_bars)
+
+    return bars
+
+
+def merge_indicators(*configs: dict) -> dict:
+    """
+    Union of indicator configs in canonical form
+    (sorted, de-duplicated, empty kinds dropped), e.g.
+
+        {"sma": [50]} + {"sma": [20, 50], "rsi": [14]}
+        -> {"rsi": [14], "sma": [20, 50]}
+
+    Same indicators -> same dict -> same cache key, whoever asks.
+    """
+    merged: dict[str, set] = {}
+
+    for config in configs:
+        for kind, params in (config or {}).items():
+            for p in params:
+                merged.setdefault(kind, set()).add(
+                    tuple(p) if isinstance(p, (list, tuple)) else p
+                )
+
+    return {
+        kind: [list(p) if isinstance(p, tuple) else p for p in sorted(values)]
+        for kind, values in sorted(merged.items())
+        if values
+    }
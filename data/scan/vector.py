@@ -0,0 +1,219 @@
+# scan/vector.py
+
+"""
+Cross-sectional (vectorized) scan mode.
+
+Instead of one DataFrame + one rule call per symbol, every rule is
+evaluated ONCE over a symbols x bars matrix taken straight from the
+price panel and returns a boolean mask over all symbols.
+
+Matrix layout (see scan/rules.py):
+    m["count"]   -> number of symbols
+    m["length"]  -> candles available per symbol
+    m[column]    -> 2D float array, right aligned, NaN padded on the left
+
+Indicator columns carry the same names (and the same values) as
+scan/indicators.py produces, so rules behave identically in both modes.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scan.indicators import (
+    sma_col,
+    ema_col,
+    rsi_col,
+    macd_cols,
+    macd_hist_col,
+)
+from scan.panel import PRICE_COLUMNS, get_tf_panel
+from scan.utils import ema_warmup
+
+
+# =====================================================
+# PANEL -> MATRIX
+# =====================================================
+def _tail(panel: dict, rows: np.ndarray, col: str, width: int) -> np.ndarray:
+    """
+    Last `width` values of `col` for each panel row, right aligned
+    """
+    width = max(int(width), 1)
+    offset = panel["offset"][rows]
+    length = panel["length"][rows]
+
+    steps = np.arange(width) - width
+    pos = (offset + length)[:, None] + steps[None, :]
+    valid = steps[None, :] >= -length[:, None]
+
+    out = panel[col][np.where(valid, pos, 0)].astype(np.float64)
+    out[~valid] = np.nan
+    return out
+
+
+def build_matrix(symbols: list[str], timeframe: str, bars: int) -> dict:
+    """
+    OHLCV matrix holding the trailing `bars` candles of each known symbol
+    """
+    panel = get_tf_panel(timeframe)
+    index = panel["index"]
+
+    known = [s for s in symbols if s in index]
+    rows = np.array([index[s] for s in known], dtype=np.int64)
+
+    m = {
+        "symbols": known,
+        "count": len(known),
+        "length": panel["length"][rows],
+        "_panel": panel,
+        "_rows": rows,
+    }
+    for col in PRICE_COLUMNS:
+        m[col] = _tail(panel, rows, col, bars)
+    return m
+
+
+# =====================================================
+# MATRIX INDICATORS (ROW-WISE, SAME MATH AS indicators.py)
+# =====================================================
+def _sma(close: np.ndarray, period: int, out_bars: int) -> np.ndarray:
+    windows = sliding_window_view(close[:, -(out_bars + period - 1):], period, axis=1)
+    return windows.mean(axis=-1)
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    pandas ewm(span, adjust=False).mean() along axis 1.
+    Leading NaNs are skipped per row, exactly like pandas.
+    """
+    alpha = 2.0 / (span + 1.0)
+    old_wt = 1.0 - alpha
+    denom = old_wt + alpha
+
+    out = np.empty_like(values)
+    weighted = values[:, 0].copy()
+    out[:, 0] = weighted
+
+    for t in range(1, values.shape[1]):
+        cur = values[:, t]
+        step = (old_wt * weighted + alpha * cur) / denom
+        weighted = np.where(
+            np.isnan(weighted),
+            cur,
+            np.where(weighted == cur, weighted, step),
+        )
+        out[:, t] = weighted
+
+    return out
+
+
+def _rsi(close: np.ndarray, period: int, out_bars: int) -> np.ndarray:
+    src = close[:, -(out_bars + period):]
+    delta = np.diff(src, axis=1)
+
+    gain = np.clip(delta, 0, None)
+    loss = -np.clip(delta, None, 0)
+
+    avg_gain = sliding_window_view(gain, period, axis=1).mean(axis=-1)
+    avg_loss = sliding_window_view(loss, period, axis=1).mean(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def apply_matrix_indicators(m: dict, config: dict, out_bars: int,
+                            tail: bool = True) -> dict:
+    """
+    Add indicator columns (trailing `out_bars` values) to the matrix.
+
+    SMA / RSI only need a finite window of closes. EMA / MACD are
+    recursive: with tail=True they start ema_warmup() bars back
+    (within utils.EMA_CONVERGENCE_EPS), otherwise over full history.
+    """
+    panel, rows = m["_panel"], m["_rows"]
+    out_bars = max(int(out_bars), 1)
+
+    for period in config.get("sma", []):
+        close = _tail(panel, rows, "close", out_bars + period - 1)
+        m[sma_col(period)] = _sma(close, period, out_bars)
+
+    for period in config.get("rsi", []):
+        close = _tail(panel, rows, "close", out_bars + period)
+        m[rsi_col(period)] = _rsi(close, period, out_bars)
+
+    recursive = config.get("ema", []) or config.get("macd", [])
+    if recursive and m["count"]:
+        full = int(m["length"].max())
+
+        def closes(warmup: int) -> np.ndarray:
+            width = min(full, warmup + out_bars) if tail else full
+            return _tail(panel, rows, "close", width)
+
+        for length in config.get("ema", []):
+            close = closes(ema_warmup(length))
+            m[ema_col(length)] = _ema(close, length)[:, -out_bars:]
+
+        for fast, slow, signal in config.get("macd", []):
+            close = closes(ema_warmup(slow) + ema_warmup(signal))
+            macd = _ema(close, fast) - _ema(close, slow)
+            sig = _ema(macd, signal)
+            macd_col, signal_col = macd_cols(fast, slow, signal)
+            m[macd_col] = macd[:, -out_bars:]
+            m[signal_col] = sig[:, -out_bars:]
+            m[macd_hist_col(fast, slow, signal)] = (macd - sig)[:, -out_bars:]
+
+    return m
+
+
+# =====================================================
+# VECTOR SCAN
+# =====================================================
+def run_vector_scan(
+    symbols: list[str],
+    timeframe: str,
+    indicator_config: dict,
+    rule_fn,
+    min_bars: int = 50,
+    tail: bool = True,
+    on_match=None,
+) -> list[str]:
+    """
+    Same result list as the per-symbol loop, one rule call in total
+
+    on_match: optional callback(symbol, row) for each match; row maps
+              close / volume / every indicator column to its trailing
+              values taken from the matrix (no frame is built)
+    """
+    vector = getattr(rule_fn, "vector", None)
+    if vector is None:
+        raise TypeError("rule_fn has no vectorized form (rule.vector)")
+
+    bars = getattr(rule_fn, "bars", 1)
+
+    m = build_matrix(symbols, timeframe, bars)
+    if m["count"] == 0:
+        return []
+
+    before = set(m)
+    m = apply_matrix_indicators(m, indicator_config, bars, tail=tail)
+
+    mask = vector(m)
+    mask &= (m["length"] > 0) & (m["length"] >= min_bars)
+
+    matches = [s for s, ok in zip(m["symbols"], mask) if ok]
+
+    if on_match is not None and matches:
+        hit = np.flatnonzero(mask)
+        rows = m["_rows"][hit]
+        # two closes even for 1-bar rules (% change needs the previous)
+        close = _tail(m["_panel"], rows, "close", 2)
+        volume = m["volume"][hit]
+        indicators = {col: m[col][hit] for col in m if col not in before}
+
+        for i, symbol in enumerate(matches):
+            row = {"close": close[i], "volume": volume[i]}
+            for col, values in indicators.items():
+                row[col] = values[i]
+            on_match(symbol, row)
+
+    return matches
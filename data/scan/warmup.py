@@ -0,0 +1,126 @@
+# scan/warmup.py
+
+"""
+Background cache warm-up.
+
+Runs after startup and after every successful data update: for every
+symbol of the configured universes it rebuilds the base candles and the
+indicator columns (scan/cache.py levels) of the most requested indicator
+sets, so the first scans after a restart / update are warm.
+
+The thread runs at lowered OS priority and yields between symbols;
+starting a new warm-up supersedes a running one. Progress is exposed by
+warmup_status() (-> /update/status).
+"""
+
+import os
+import time
+import threading
+
+from scan.cache import popular_configs
+from scan.engine import build_frame
+from scan.state import TRACKED_INDICATORS
+from scan.utils import merge_indicators
+
+# =====================================================
+# CONFIG
+# =====================================================
+# most requested (tf, config) pairs to warm
+WARMUP_CONFIGS = 5
+
+# used until scans have been seen (e.g. right after startup)
+DEFAULT_WARMUP = [("1D", TRACKED_INDICATORS)]
+
+WARMUP_NICE = 10
+
+_STATE = {
+    "running": False,
+    "reason": None,
+    "done": 0,
+    "total": 0,
+    "started": None,
+    "finished": None,
+}
+_GENERATION = 0
+_LOCK = threading.Lock()
+
+
+def _lower_priority():
+    # per-thread on Linux (threads are tasks); best effort elsewhere
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARMUP_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def _warm_plan() -> dict[str, dict]:
+    """
+    tf -> union of the indicator sets worth warming on that tf
+    """
+    configs = popular_configs(WARMUP_CONFIGS) or DEFAULT_WARMUP
+
+    plan: dict[str, dict] = {}
+    for tf, cfg in configs:
+        plan[tf] = merge_indicators(plan.get(tf, {}), cfg)
+    return plan
+
+
+def _run(generation: int, symbols: list[str], reason: str):
+    _lower_priority()
+
+    plan = _warm_plan()
+    _STATE.update({
+        "running": True,
+        "reason": reason,
+        "done": 0,
+        "total": len(symbols) * len(plan),
+        "started": time.time(),
+        "finished": None,
+    })
+
+    for tf, cfg in plan.items():
+        for symbol in symbols:
+            if generation != _GENERATION:
+                return  # superseded by a newer warm-up
+
+            try:
+                # fills base + column levels; full history serves
+                # every tail window a scan can ask for
+                build_frame(symbol, tf, cfg)
+            except Exception as e:
+                print(f"[WARMUP ERROR] {symbol} {tf}: {e}")
+
+            _STATE["done"] += 1
+            time.sleep(0)  # let request threads have the GIL
+
+    _STATE["running"] = False
+    _STATE["finished"] = time.time()
+
+
+# =====================================================
+# API
+# =====================================================
+def start_warmup(symbols: list[str], reason: str = "startup"):
+    """
+    Warm caches for `symbols` in a background thread (returns at once)
+    """
+    global _GENERATION
+
+    with _LOCK:
+        _GENERATION += 1
+        generation = _GENERATION
+
+    threading.Thread(
+        target=_run,
+        args=(generation, list(symbols), reason),
+        name="scan-warmup",
+        daemon=True,
+    ).start()
+
+
+def warmup_status() -> dict:
+    status = dict(_STATE)
+    status["pct"] = (
+        round(status["done"] / status["total"] * 100, 1) if status["total"] else 0.0
+    )
+    return status
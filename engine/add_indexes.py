@@ -7,9 +7,11 @@ DB_PATH = os.path.join(BASE_DIR, "..", "data", "stocks.db")
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
 
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbol ON prices(symbol)")
+# PRIMARY KEY (symbol, date) already serves symbol and symbol+date lookups;
+# extra copies only slow every insert down
+cursor.execute("DROP INDEX IF EXISTS idx_symbol")
+cursor.execute("DROP INDEX IF EXISTS idx_symbol_date")
 cursor.execute("CREATE INDEX IF NOT EXISTS idx_date ON prices(date)")
-cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbol_date ON prices(symbol, date)")
 
 conn.commit()
 conn.close()
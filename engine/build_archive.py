@@ -0,0 +1,44 @@
+"""
+Columnar price archive (data/scan/archive.py) maintenance.
+
+    SCAN_ARCHIVE=1 python engine/build_archive.py            full export from SQLite
+    SCAN_ARCHIVE=1 python engine/build_archive.py --append   only rows stored since the last run
+    SCAN_ARCHIVE=1 python engine/build_archive.py --check [--deep]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+from scan.archive import (
+    ARCHIVE_ENABLED,
+    append_archive,
+    check_archive,
+    export_archive,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--append", action="store_true")
+parser.add_argument("--check", action="store_true")
+parser.add_argument("--deep", action="store_true", help="compare every value")
+args = parser.parse_args()
+
+if not ARCHIVE_ENABLED:
+    print("❌ Set SCAN_ARCHIVE=1 (or a directory) to use the archive")
+    sys.exit(1)
+
+if args.check:
+    report = check_archive(deep=args.deep)
+    print(json.dumps(report, indent=2))
+    print("✅ Archive matches SQLite" if report["ok"] else "❌ Archive out of sync")
+    sys.exit(0 if report["ok"] else 1)
+
+rows = append_archive() if args.append else export_archive()
+print(f"✅ Archive ready ({rows} rows written)")
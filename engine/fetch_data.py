@@ -1,7 +1,7 @@
 import yfinance as yf
 import pandas as pd
-import sqlite3
 import os
+import sys
 import logging
 from datetime import timedelta, datetime
 
@@ -16,9 +16,16 @@ logger = logging.getLogger("uvicorn.error")
 # =====================================================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
-DB_PATH = os.path.join(DATA_DIR, "stocks.db")
 SYMBOL_FILE = os.path.join(DATA_DIR, "nse_symbols.txt")
 
+# scan/ lives under data/ (needed when run as a standalone script)
+if os.path.abspath(DATA_DIR) not in sys.path:
+    sys.path.insert(0, os.path.abspath(DATA_DIR))
+
+from db import SHADOW_UPDATES, get_connection, prices_int_dates, shadow_update
+from scan.archive import append_archive
+from scan.state import update_symbol_state
+
 TODAY = datetime.today().date()
 
 # =====================================================
@@ -26,7 +33,7 @@ TODAY = datetime.today().date()
 # =====================================================
 def get_last_date(symbol):
     """Return valid YYYY-MM-DD or None (never crashes)"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute("SELECT last_date FROM stock_meta WHERE symbol = ?", (symbol,))
     row = cur.fetchone()
@@ -50,16 +57,13 @@ def update_last_date(symbol, last_date):
         logger.error(f"  ⚠️ Skipping invalid last_date write for {symbol}: {last_date}")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO stock_meta (symbol, last_date)
-        VALUES (?, ?)
-        ON CONFLICT(symbol)
-        DO UPDATE SET last_date = excluded.last_date
-    """, (symbol, last_date))
-    conn.commit()
-    conn.close()
+    with get_connection(write=True) as conn:
+        conn.execute("""
+            INSERT INTO stock_meta (symbol, last_date)
+            VALUES (?, ?)
+            ON CONFLICT(symbol)
+            DO UPDATE SET last_date = excluded.last_date
+        """, (symbol, last_date))
 
 # =====================================================
 # SAVE DATA TO DATABASE
@@ -107,15 +111,30 @@ def save_to_db(symbol, df):
     if not records:
         return None
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.executemany("""
-        INSERT OR IGNORE INTO prices
-        (symbol, date, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, records)
-    conn.commit()
-    conn.close()
+    with get_connection(write=True) as conn:
+        rows = records
+        if prices_int_dates(conn):
+            # migrated schema: date is a day number (days since 1970-01-01)
+            days = (
+                pd.to_datetime(df["date"], format="%Y-%m-%d")
+                .to_numpy()
+                .astype("datetime64[D]")
+                .astype("int64")
+                .tolist()
+            )
+            rows = [(r[0], d) + r[2:] for r, d in zip(records, days)]
+
+        conn.executemany("""
+            INSERT OR IGNORE INTO prices
+            (symbol, date, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+        # Advance persisted indicator state with the new candles (O(1) per bar)
+        try:
+            update_symbol_state(conn, symbol_clean, [(r[1], r[5]) for r in records])
+        except Exception as e:
+            logger.warning(f"  ⚠️ Indicator state update failed for {symbol_clean}: {e}")
 
     return records[-1][1]  # last candle date inserted
 
@@ -179,21 +198,24 @@ def fetch_stock(symbol):
     return None
 
 def sync_symbols_from_prices():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT OR IGNORE INTO symbols (symbol, active)
-        SELECT DISTINCT symbol, 1 FROM prices
-    """)
-    conn.commit()
-    conn.close()
+    with get_connection(write=True) as conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO symbols (symbol, active)
+            SELECT DISTINCT symbol, 1 FROM prices
+        """)
     logger.info("✅ Symbols table synced")
 
 # =====================================================
 # RUNNER FUNCTION (Called by FastAPI)
 # =====================================================
-def run_fetch_all():
-    """Main entry point to be called from the update button"""
+def run_fetch_all(shadow: bool = SHADOW_UPDATES):
+    """
+    Main entry point to be called from the update button
+
+    shadow : write into a copy of the database and publish it in one
+             step at the end (DB_SHADOW_UPDATE=1), so readers never see
+             a half-finished update
+    """
     logger.info("🚀 Starting NSE data update process...")
     
     if not os.path.exists(SYMBOL_FILE):
@@ -205,16 +227,26 @@ def run_fetch_all():
 
     max_updated_date = None
 
-    for stock in stocks_list:
-        try:
-            updated_date = fetch_stock(stock)
-            if updated_date:
-                if not max_updated_date or updated_date > max_updated_date:
-                    max_updated_date = updated_date
-        except Exception as e:
-            logger.error(f"  ❌ Critical error fetching {stock}: {e}")
+    with shadow_update(shadow):
+        for stock in stocks_list:
+            try:
+                updated_date = fetch_stock(stock)
+                if updated_date:
+                    if not max_updated_date or updated_date > max_updated_date:
+                        max_updated_date = updated_date
+            except Exception as e:
+                logger.error(f"  ❌ Critical error fetching {stock}: {e}")
+
+        sync_symbols_from_prices()
 
-    sync_symbols_from_prices()
+    if shadow:
+        logger.info("🔁 Shadow database published")
+
+    # columnar archive (SCAN_ARCHIVE): append what this run stored
+    try:
+        append_archive()
+    except Exception as e:
+        logger.warning(f"  ⚠️ Archive append failed: {e}")
 
     if max_updated_date:
         logger.info(f"📅 Latest market data updated till: {max_updated_date}")
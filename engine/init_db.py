@@ -7,17 +7,19 @@ DB_PATH = os.path.join(BASE_DIR, "..", "data", "stocks.db")
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
 
+# date = day number (days since 1970-01-01); rows clustered by (symbol, date).
+# Older databases: python engine/migrate_prices.py
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS prices (
-    symbol TEXT,
-    date TEXT,
+    symbol TEXT NOT NULL,
+    date INTEGER NOT NULL,
     open REAL,
     high REAL,
     low REAL,
     close REAL,
     volume INTEGER,
     PRIMARY KEY (symbol, date)
-)
+) WITHOUT ROWID
 """)
 
 conn.commit()
@@ -0,0 +1,34 @@
+import sqlite3
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+DB_PATH = os.path.join(DATA_DIR, "stocks.db")
+
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+from scan.state import ensure_state_table, update_symbol_state
+
+conn = sqlite3.connect(DB_PATH)
+cursor = conn.cursor()
+
+ensure_state_table(conn)
+
+# Bootstrap: symbols without state are built from full history once,
+# existing rows are left as they are (no new bars passed in)
+cursor.execute("SELECT DISTINCT symbol FROM prices")
+symbols = [r[0] for r in cursor.fetchall()]
+
+rows = 0
+for i, symbol in enumerate(symbols, 1):
+    rows += update_symbol_state(conn, symbol, [])
+    if i % 100 == 0:
+        conn.commit()
+        print(f"  {i}/{len(symbols)} symbols")
+
+conn.commit()
+conn.close()
+
+print(f"✅ indicator_state ready ({rows} rows, {len(symbols)} symbols)")
@@ -0,0 +1,157 @@
+"""
+Synthetic sample database for local runs and the data/scan/test_*.py
+check scripts (no network, deterministic).
+
+    python engine/make_sample_db.py [--db PATH] [--symbols 300]
+                                    [--start 2010-01-01] [--end 2025-06-30]
+                                    [--seed 7] [--force]
+
+Symbols are SYM0000, SYM0001, ... with random-walk OHLCV candles on
+weekdays. Every 10th symbol starts late (short history) so min-bars
+filtering is exercised. The first 50 / 100 symbols form NIFTY50 /
+NIFTY100. Uses the compact prices layout (engine/init_db.py).
+Run engine/init_indicator_state.py afterwards for incremental state.
+"""
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "..", "data", "stocks.db")
+
+SCHEMA = """
+CREATE TABLE prices (
+    symbol TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE INDEX idx_date ON prices(date);
+
+CREATE TABLE symbols (
+    symbol TEXT PRIMARY KEY,
+    active INTEGER DEFAULT 1,
+    added_on TEXT,
+    removed_on TEXT
+);
+CREATE TABLE stock_meta (
+    symbol TEXT PRIMARY KEY,
+    last_date TEXT
+);
+CREATE TABLE index_members (
+    index_name TEXT,
+    symbol TEXT,
+    PRIMARY KEY (index_name, symbol)
+);
+CREATE TABLE system_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INDEXES = {"NIFTY50": 50, "NIFTY100": 100}
+
+
+# =====================================================
+# CANDLES
+# =====================================================
+def candles(rng, n: int):
+    """
+    (open, high, low, close, volume) arrays for n bars
+    """
+    drift = rng.normal(0.0003, 0.0004)
+    vol = rng.uniform(0.01, 0.03)
+    close = rng.uniform(20, 2000) * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+
+    prev = np.concatenate(([close[0]], close[:-1]))
+    open_ = prev * (1 + rng.normal(0, vol / 4, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, n)))
+    volume = rng.integers(1_000, 100_000, n)
+    return open_, high, low, close, volume
+
+
+def build(conn, n_symbols: int, start: str, end: str, seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    days = days[np.is_busday(days)]
+    day_nums = days.astype(np.int64)
+
+    conn.executescript(SCHEMA)
+    rows = 0
+
+    for i in range(n_symbols):
+        symbol = f"SYM{i:04d}"
+
+        # every 10th symbol: short history (20 .. 400 bars)
+        first = len(days) - int(rng.integers(20, 400)) if i % 10 == 9 else 0
+        n = len(days) - first
+        o, h, l, c, v = candles(rng, n)
+
+        conn.executemany(
+            "INSERT INTO prices (symbol, date, open, high, low, close, volume) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                [symbol] * n,
+                day_nums[first:].tolist(),
+                o.round(2).tolist(),
+                h.round(2).tolist(),
+                l.round(2).tolist(),
+                c.round(2).tolist(),
+                v.tolist(),
+            ),
+        )
+        conn.execute("INSERT INTO symbols (symbol, active) VALUES (?, 1)", (symbol,))
+        conn.execute(
+            "INSERT INTO stock_meta (symbol, last_date) VALUES (?, ?)",
+            (symbol, str(days[-1])),
+        )
+        for index_name, size in INDEXES.items():
+            if i < size:
+                conn.execute(
+                    "INSERT INTO index_members (index_name, symbol) VALUES (?, ?)",
+                    (index_name, symbol),
+                )
+        rows += n
+
+    conn.commit()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--start", default="2010-01-01")
+    parser.add_argument("--end", default="2025-06-30")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--force", action="store_true",
+                        help="replace an existing database")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.db)
+    if os.path.exists(path):
+        if not args.force:
+            print(f"❌ {path} exists (use --force to replace it)")
+            return
+        for p in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(p):
+                os.remove(p)
+
+    conn = sqlite3.connect(path)
+    rows = build(conn, args.symbols, args.start, args.end, args.seed)
+    conn.close()
+
+    print(f"✅ Sample database written: {path} "
+          f"({args.symbols} symbols, {rows:,} price rows)")
+
+
+if __name__ == "__main__":
+    main()
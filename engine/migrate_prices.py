@@ -0,0 +1,262 @@
+"""
+Migrate `prices` to the compact layout.
+
+    before : prices(symbol TEXT, date TEXT, ...) rowid table
+             + sqlite_autoindex (symbol, date)  (the PRIMARY KEY)
+             + idx_symbol, idx_symbol_date      (duplicates of the PK)
+             + idx_date
+    after  : prices(symbol TEXT, date INTEGER, ...) WITHOUT ROWID,
+             clustered on PRIMARY KEY (symbol, date)
+             + idx_date                         (incremental panel refresh)
+
+`date` becomes a day number (days since 1970-01-01), the same encoding
+the scan panel uses in memory, so loading is a cast instead of a string
+parse. stock_meta / indicator_state keep their 'YYYY-MM-DD' text.
+
+Prints file size and query timings before and after. Stop the API
+server (and any fetch) before running.
+
+    python engine/migrate_prices.py [--db PATH] [--backup] [--bench-only]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "..", "data", "stocks.db")
+
+REDUNDANT_INDEXES = ("idx_symbol", "idx_symbol_date")
+
+# 'YYYY-MM-DD' -> days since 1970-01-01 (julianday of the epoch)
+DAY_SQL = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+
+COMPACT_SCHEMA = """
+CREATE TABLE {name} (
+    symbol TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID
+"""
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+def is_compact(conn) -> bool:
+    for _, name, decl, *_ in conn.execute("PRAGMA table_info(prices)"):
+        if name == "date":
+            return (decl or "").upper().startswith("INT")
+    return False
+
+
+def db_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(p)
+        for p in (path, path + "-wal")
+        if os.path.exists(p)
+    )
+
+
+def _best(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+def benchmark(conn, path: str) -> dict:
+    """
+    Size + the queries the app actually runs against prices
+    """
+    compact = is_compact(conn)
+    symbols = [r[0] for r in conn.execute(
+        "SELECT DISTINCT symbol FROM prices ORDER BY symbol"
+    )]
+    sample = symbols[::max(1, len(symbols) // 100)]
+
+    last = conn.execute("SELECT MAX(date) FROM prices").fetchone()[0]
+    if last is None:
+        return {"bytes": db_bytes(path), "rows": 0}
+    last_day = int(last) if compact else int(
+        np.datetime64(last, "D").astype(np.int64)
+    )
+    cutoff = last_day - 30
+    cutoff_param = cutoff if compact else str(np.datetime64(cutoff, "D"))
+
+    def full_load():
+        # panel.load_panel: one bulk read + date decode
+        df = pd.read_sql_query(
+            "SELECT symbol, date, open, high, low, close, volume "
+            "FROM prices ORDER BY symbol, date",
+            conn,
+        )
+        if compact:
+            df["date"].to_numpy().astype(np.int32)
+        else:
+            pd.to_datetime(df["date"], format="%Y-%m-%d")
+
+    def per_symbol():
+        # state._read_history / the old per-symbol loader
+        for s in sample:
+            conn.execute(
+                "SELECT date, close FROM prices WHERE symbol = ? ORDER BY date",
+                (s,),
+            ).fetchall()
+
+    def recent():
+        # panel.refresh_panel: rows past a cutoff
+        conn.execute(
+            "SELECT symbol, date, open, high, low, close, volume "
+            "FROM prices WHERE date > ? ORDER BY symbol, date",
+            (cutoff_param,),
+        ).fetchall()
+
+    def insert():
+        # fetch_data.save_to_db: one new candle per symbol, rolled back
+        day = last_day + 1
+        date = day if compact else str(np.datetime64(day, "D"))
+        rows = [(s, date, 1.0, 1.0, 1.0, 1.0, 1) for s in symbols]
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO prices "
+            "(symbol, date, open, high, low, close, volume) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("ROLLBACK")
+
+    return {
+        "bytes": db_bytes(path),
+        "rows": conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0],
+        "full_load_ms": _best(full_load, repeat=1),
+        f"per_symbol_x{len(sample)}_ms": _best(per_symbol),
+        "recent_30d_ms": _best(recent),
+        f"insert_x{len(symbols)}_ms": _best(insert),
+    }
+
+
+def print_report(before: dict | None, after: dict):
+    print(f"\n{'metric':<24}{'before':>14}{'after':>14}{'change':>10}")
+    for key in after:
+        b = before.get(key) if before else None
+        a = after[key]
+        if key == "bytes":
+            fmt = lambda v: f"{v / 1e6:.1f} MB"
+        elif key == "rows":
+            fmt = lambda v: f"{v:,}"
+        else:
+            fmt = lambda v: f"{v:.1f}"
+        change = f"{(a / b - 1) * 100:+.0f}%" if b else ""
+        print(f"{key:<24}{fmt(b) if b is not None else '-':>14}"
+              f"{fmt(a):>14}{change:>10}")
+
+
+# =====================================================
+# MIGRATION
+# =====================================================
+def migrate(conn) -> int:
+    """
+    Rewrite prices in one transaction; returns rows copied
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE IF EXISTS prices_compact")
+        conn.execute(COMPACT_SCHEMA.format(name="prices_compact"))
+
+        # rows arrive in PK order -> sequential b-tree appends
+        conn.execute(f"""
+            INSERT OR IGNORE INTO prices_compact
+            (symbol, date, open, high, low, close, volume)
+            SELECT symbol, {DAY_SQL}, open, high, low, close, volume
+            FROM prices
+            WHERE symbol IS NOT NULL AND julianday(date) IS NOT NULL
+            ORDER BY symbol, date
+        """)
+        copied = conn.execute("SELECT COUNT(*) FROM prices_compact").fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+        for name in REDUNDANT_INDEXES + ("idx_date",):
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("DROP TABLE prices")
+        conn.execute("ALTER TABLE prices_compact RENAME TO prices")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON prices(date)")
+
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if copied != total:
+        print(f"⚠️ Skipped {total - copied} row(s) with a NULL symbol or invalid date")
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--backup", action="store_true",
+                        help="copy the database to <db>.bak first")
+    parser.add_argument("--bench-only", action="store_true",
+                        help="only print size / timings of the current layout")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.db)
+    if not os.path.exists(path):
+        print(f"❌ Database not found at: {path}")
+        return
+
+    # autocommit: transactions are explicit
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    if args.bench_only or is_compact(conn):
+        if not args.bench_only:
+            print("✅ prices already uses the compact layout")
+        print_report(None, benchmark(conn, path))
+        conn.close()
+        return
+
+    print("⏱  Benchmarking current layout...")
+    before = benchmark(conn, path)
+
+    if args.backup:
+        conn.close()
+        shutil.copy2(path, path + ".bak")
+        print(f"💾 Backup written: {path}.bak")
+        conn = sqlite3.connect(path, isolation_level=None)
+
+    print("🔧 Migrating prices...")
+    started = time.perf_counter()
+    copied = migrate(conn)
+    print(f"   {copied:,} rows in {time.perf_counter() - started:.1f}s")
+
+    print("🧹 VACUUM...")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    print("⏱  Benchmarking compact layout...")
+    after = benchmark(conn, path)
+    conn.close()
+
+    print_report(before, after)
+    print("\n✅ prices migrated (restart the API server)")
+
+
+if __name__ == "__main__":
+    main()
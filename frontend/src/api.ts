@@ -21,7 +21,7 @@ export async function getChart(
 ): Promise<ChartResponse> {
   const r = await fetch(
     `${API}/chart?symbol=${symbol}&tf=${tf}`,
-    { cache: "no-store" }
+    { cache: "no-cache" }  // revalidate via ETag -> 304 when unchanged
   );
   return r.json();
 }